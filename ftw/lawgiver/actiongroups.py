@@ -3,6 +3,45 @@ from ftw.lawgiver.interfaces import IActionGroupRegistry
 from zope.interface import implements
 
 
+class WorkflowActionGroupIndex(object):
+    """A precompiled, read-only view of the action group registry for a
+    single workflow.
+    It maps permissions to action groups, action groups to permissions and
+    knows the ignored permissions of the workflow.
+    """
+
+    def __init__(self, workflow_name, permissions, ignores):
+        self.workflow_name = workflow_name
+
+        ignored = set(ignores.get(None, ()))
+        ignored.update(ignores.get(workflow_name, ()))
+        self.ignored = frozenset(ignored)
+
+        self.groups_by_permission = {}
+        permissions_by_group = defaultdict(set)
+
+        for permission, workflows in permissions.items():
+            if permission in self.ignored:
+                continue
+
+            if workflow_name in workflows:
+                group = workflows[workflow_name]
+            elif None in workflows:
+                group = workflows[None]
+            else:
+                continue
+
+            self.groups_by_permission[permission] = group
+            permissions_by_group[group].add(permission)
+
+        self.permissions_by_group = dict(
+            (group, frozenset(perms))
+            for group, perms in permissions_by_group.items())
+
+    def get_action_group(self, permission_title):
+        return self.groups_by_permission.get(permission_title, None)
+
+
 class ActionGroupRegistry(object):
 
     implements(IActionGroupRegistry)
@@ -10,6 +49,7 @@ class ActionGroupRegistry(object):
     def __init__(self):
         self._permissions = {}
         self._ignores = defaultdict(set)
+        self._indexes = {}
 
     def update(self, action_group, permissions, workflow=None):
         for perm in permissions:
@@ -18,45 +58,28 @@ class ActionGroupRegistry(object):
 
             self._permissions[perm][workflow] = action_group
 
+        self._indexes.clear()
+
     def ignore(self, permissions, workflow=None):
         self._ignores[workflow].update(permissions)
+        self._indexes.clear()
 
     def get_action_groups_for_workflow(self, workflow_name):
-        result = {}
-
-        ignored_permissions = self.get_ignored_permissions(workflow_name)
-
-        for permission, workflows in self._permissions.items():
-            if permission in ignored_permissions:
-                continue
-
-            if workflow_name in workflows:
-                wfname = workflow_name
-            elif None in workflows:
-                wfname = None
-            else:
-                continue
-
-            group = workflows[wfname]
-            if group not in result:
-                result[group] = set()
-
-            result[group].add(permission)
-
-        return result
+        index = self.get_index(workflow_name)
+        return dict((group, set(permissions)) for group, permissions
+                    in index.permissions_by_group.items())
 
     def get_action_group_for_permission(self, permission_title,
                                         workflow_name=None):
-        if permission_title not in self._permissions:
-            return None
-
-        if permission_title in self.get_ignored_permissions(workflow_name):
-            return None
-
-        permission = self._permissions[permission_title]
-        return permission.get(workflow_name, permission.get(None, None))
+        return self.get_index(workflow_name).get_action_group(
+            permission_title)
 
     def get_ignored_permissions(self, workflow_name=None):
-        permissions = set(self._ignores[None])
-        permissions.update(self._ignores[workflow_name])
-        return permissions
+        return set(self.get_index(workflow_name).ignored)
+
+    def get_index(self, workflow_name=None):
+        index = self._indexes.get(workflow_name)
+        if index is None:
+            index = self._indexes[workflow_name] = WorkflowActionGroupIndex(
+                workflow_name, self._permissions, self._ignores)
+        return index
@@ -0,0 +1,160 @@
+from ZODB.POSException import ConflictError
+from ftw.lawgiver.fingerprint import calculate_fingerprint
+from ftw.lawgiver.fingerprint import is_up_to_date
+from ftw.lawgiver.fingerprint import write_fingerprint
+from ftw.lawgiver.generator import WorkflowGenerator
+from ftw.lawgiver.interfaces import IActionGroupRegistry
+from ftw.lawgiver.interfaces import IBatchWorkflowGenerator
+from ftw.lawgiver.interfaces import IPermissionCollector
+from ftw.lawgiver.wdl.parser import SpecificationParser
+from ftw.lawgiver.wdl.precompiled import load_specification
+from multiprocessing import Pool
+from plone.i18n.normalizer.interfaces import INormalizer
+from zope.component import getUtility
+from zope.interface import implements
+import os
+import tempfile
+import time
+
+
+# The generator of a worker process, created by `init_worker`.
+_worker_generator = None
+
+
+class BatchWorkflowGenerator(object):
+    implements(IBatchWorkflowGenerator)
+
+    def __call__(self, specification_paths, processes=1, force=False):
+        tasks = map(self._create_task, sorted(specification_paths))
+        results = dict((task['specification_path'], get_skipped_result(task))
+                       for task in tasks
+                       if not force and is_up_to_date(task['definition_path'],
+                                                      task['fingerprint']))
+        tasks = [task for task in tasks
+                 if task['specification_path'] not in results]
+
+        normalizer = getUtility(INormalizer)
+
+        if processes == 1 or len(tasks) < 2:
+            # One generator for all workflows, so that the normalized titles
+            # are shared.
+            generator = WorkflowGenerator(normalizer=normalizer)
+            generated = [generate_workflow(task, generator)
+                         for task in tasks]
+
+        else:
+            pool = Pool(processes, init_worker, (normalizer, ))
+            try:
+                generated = pool.map(generate_workflow, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+
+        results.update((result['specification_path'], result)
+                       for result in generated)
+        return [results[path] for path in sorted(results)]
+
+    def _create_task(self, path):
+        """Returns a picklable task for generating the workflow of the
+        specification at `path`. The task contains a snapshot of everything
+        the generator would otherwise look up in the component registry.
+        """
+        workflow_id = os.path.basename(os.path.dirname(path))
+        managed_permissions = sorted(
+            getUtility(IPermissionCollector).collect(workflow_id))
+        action_groups = getUtility(IActionGroupRegistry).get_index(
+            workflow_id)
+
+        with open(path) as specfile:
+            specification_data = specfile.read()
+
+        return {'workflow_id': workflow_id,
+                'specification_path': path,
+                'definition_path': os.path.join(os.path.dirname(path),
+                                                'definition.xml'),
+                'specification_data': specification_data,
+                'fingerprint': calculate_fingerprint(
+                    workflow_id, specification_data, managed_permissions,
+                    action_groups),
+                'managed_permissions': managed_permissions,
+                'action_groups': action_groups}
+
+
+def get_skipped_result(task):
+    return {'workflow_id': task['workflow_id'],
+            'specification_path': task['specification_path'],
+            'definition_path': task['definition_path'],
+            'up_to_date': True,
+            'duration': 0,
+            'error': None}
+
+
+def init_worker(normalizer):
+    """Creates the generator used for all tasks of a worker process.
+    """
+    global _worker_generator
+    _worker_generator = WorkflowGenerator(normalizer=normalizer)
+
+
+def generate_workflow(task, generator=None):
+    """Generates and writes the workflow of a task created by the
+    `BatchWorkflowGenerator` with the `generator`, which defaults to the
+    generator of the worker process. This function does not use the
+    component registry, so that it can run in a worker process.
+    """
+    if generator is None:
+        generator = _worker_generator
+
+    result = {'workflow_id': task['workflow_id'],
+              'specification_path': task['specification_path'],
+              'definition_path': task['definition_path'],
+              'up_to_date': False,
+              'duration': None,
+              'error': None}
+
+    start = time.time()
+    try:
+        specification = load_specification(
+            task['specification_path'], SpecificationParser(),
+            specification_data=task['specification_data'])
+
+        generator.set_snapshot(
+            managed_permissions=task['managed_permissions'],
+            action_groups=task['action_groups'])
+        write_atomically(task['definition_path'],
+                         lambda stream: generator.stream(
+                task['workflow_id'], specification, stream))
+        write_fingerprint(task['definition_path'], task['fingerprint'])
+
+    except ConflictError:
+        raise
+
+    except Exception, exc:
+        result['error'] = str(exc)
+
+    result['duration'] = time.time() - start
+    return result
+
+
+def write_atomically(path, writer):
+    """Calls `writer` with a temporary file next to `path` and renames the
+    temporary file to `path` when the writer succeeded, so that `path` never
+    contains a partially written file.
+    """
+    directory, filename = os.path.split(path)
+    fd, tmppath = tempfile.mkstemp(prefix='.%s.' % filename, dir=directory)
+
+    try:
+        with os.fdopen(fd, 'w') as stream:
+            writer(stream)
+
+        if os.path.exists(path):
+            os.chmod(tmppath, os.stat(path).st_mode & 0777)
+        else:
+            os.chmod(tmppath, 0644)
+
+        os.rename(tmppath, path)
+
+    except:
+        os.remove(tmppath)
+        raise
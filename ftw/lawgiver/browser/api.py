@@ -0,0 +1,147 @@
+from ZODB.POSException import ConflictError
+from email.utils import formatdate
+from ftw.lawgiver.fingerprint import get_cached_fingerprint
+from ftw.lawgiver.interfaces import IWorkflowGenerator
+from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
+from ftw.lawgiver.wdl.cache import get_specification
+from operator import itemgetter
+from zExceptions import NotFound
+from zope.component import getMultiAdapter
+from zope.component import getUtility
+from zope.interface import implementer
+from zope.publisher.browser import BrowserView
+from zope.publisher.interfaces import IPublishTraverse
+import hashlib
+import json
+import os.path
+
+
+@implementer(IPublishTraverse)
+class SpecificationsJSON(BrowserView):
+    """Lists all discovered specifications as JSON. When a specification
+    hash is traversed, the details of this specification are returned,
+    including the permission matrix.
+
+    The ETag is calculated from the fingerprints of the specifications,
+    so that clients can poll with If-None-Match. The fingerprints are
+    cached until a specification or its action groups change.
+    """
+
+    def __init__(self, context, request):
+        super(SpecificationsJSON, self).__init__(context, request)
+        self._spec_hash = None
+
+    def publishTraverse(self, request, name):
+        # stop traversing, we have arrived
+        request['TraversalRequestNameStack'] = []
+
+        self._spec_hash = name
+        return self
+
+    def __call__(self):
+        discovery = getMultiAdapter((self.context, self.request),
+                                    IWorkflowSpecificationDiscovery)
+
+        if self._spec_hash is None:
+            paths = sorted(discovery.discover())
+        else:
+            path = discovery.unhash(self._spec_hash)
+            if path is None:
+                raise NotFound(self._spec_hash)
+            paths = [path]
+
+        fingerprints = [(path, self._get_fingerprint(path))
+                        for path in paths]
+        if self._is_not_modified(fingerprints):
+            return ''
+
+        if self._spec_hash is None:
+            data = [self._get_spec_data(path, fingerprint)
+                    for path, fingerprint in fingerprints]
+        else:
+            data = self._get_spec_data(*fingerprints[0], matrix=True)
+
+        self.request.response.setHeader('Content-Type', 'application/json')
+        return json.dumps(data)
+
+    def _is_not_modified(self, fingerprints):
+        """Sets the ETag and Last-Modified headers and answers with a
+        "304 Not Modified" when the ETag matches If-None-Match.
+        """
+        etag = '"%s"' % hashlib.sha1(''.join(
+                map(itemgetter(1), fingerprints))).hexdigest()
+
+        response = self.request.response
+        response.setHeader('ETag', etag)
+
+        if fingerprints:
+            last_modified = max(map(os.path.getmtime,
+                                    map(itemgetter(0), fingerprints)))
+            response.setHeader('Last-Modified',
+                               formatdate(last_modified, usegmt=True))
+
+        if etag in [tag.strip() for tag in self.request.getHeader(
+                'If-None-Match', '').split(',')]:
+            response.setStatus(304)
+            return True
+
+        return False
+
+    def _get_fingerprint(self, path):
+        workflow_id = os.path.basename(os.path.dirname(path))
+        return get_cached_fingerprint(workflow_id, path)
+
+    def _get_spec_data(self, path, fingerprint, matrix=False):
+        discovery = getMultiAdapter((self.context, self.request),
+                                    IWorkflowSpecificationDiscovery)
+        spec_hash = discovery.hash(path)
+        workflow_id = os.path.basename(os.path.dirname(path))
+
+        data = {'id': spec_hash,
+                'workflow_id': workflow_id,
+                'specification_path': path,
+                'fingerprint': fingerprint,
+                'url': '/'.join((self.context.absolute_url(),
+                                 '@@lawgiver-specs-json', spec_hash)),
+                'details_url': '/'.join((self.context.absolute_url(),
+                                         '@@lawgiver-spec-details',
+                                         spec_hash)),
+                'title': None,
+                'description': None,
+                'status': 'ok',
+                'error': None}
+
+        try:
+            specification = get_specification(path)
+        except ConflictError:
+            raise
+        except Exception, exc:
+            data['status'] = 'error'
+            data['error'] = str(exc)
+            specification = None
+        else:
+            data['title'] = specification.title
+            data['description'] = specification.description
+
+        if matrix:
+            data.update(self._get_matrix_data(workflow_id, specification))
+
+        return data
+
+    def _get_matrix_data(self, workflow_id, specification):
+        data = {'matrix': None,
+                'matrix_error': None}
+
+        if specification is None:
+            return data
+
+        try:
+            data['matrix'] = getUtility(
+                IWorkflowGenerator).get_permission_matrix(
+                workflow_id, specification)
+        except ConflictError:
+            raise
+        except Exception, exc:
+            data['matrix_error'] = str(exc)
+
+        return data
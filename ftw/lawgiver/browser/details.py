@@ -4,10 +4,14 @@ from Products.GenericSetup.utils import importObjects
 from Products.statusmessages.interfaces import IStatusMessage
 from ZODB.POSException import ConflictError
 from ftw.lawgiver import _
+from ftw.lawgiver.fingerprint import get_fingerprint
+from ftw.lawgiver.fingerprint import is_up_to_date
+from ftw.lawgiver.fingerprint import write_fingerprint
 from ftw.lawgiver.interfaces import IPermissionCollector
 from ftw.lawgiver.interfaces import IWorkflowGenerator
+from ftw.lawgiver.interfaces import IWorkflowSecurityUpdater
 from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
-from ftw.lawgiver.wdl.interfaces import IWorkflowSpecificationParser
+from ftw.lawgiver.wdl.cache import get_specification
 from zope.component import getMultiAdapter
 from zope.component import getUtility
 from zope.component.hooks import getSite
@@ -26,6 +30,8 @@ class SpecDetails(BrowserView):
     def __init__(self, context, request):
         super(SpecDetails, self).__init__(context, request)
         self._spec_hash = None
+        self._spec_path = None
+        self._profile_name = None
         self.specification = None
 
     def publishTraverse(self, request, name):
@@ -33,6 +39,8 @@ class SpecDetails(BrowserView):
         request['TraversalRequestNameStack'] = []
 
         self._spec_hash = name
+        self._spec_path = None
+        self._profile_name = None
         return self
 
     def __call__(self, *args, **kwargs):
@@ -45,6 +53,14 @@ class SpecDetails(BrowserView):
             self.update_security()
             return self.reload()
 
+        if 'update_workflow_security' in self.request.form:
+            self.update_workflow_security()
+            return self.reload()
+
+        if 'resume_workflow_security' in self.request.form:
+            self.resume_workflow_security()
+            return self.reload()
+
         if not self.specification:
             return self.index()
 
@@ -92,6 +108,15 @@ class SpecDetails(BrowserView):
         return list(set(current_states) - set(new_states))
 
     def write_workflow(self):
+        fingerprint = get_fingerprint(self.workflow_name(),
+                                      self.get_spec_path())
+        if is_up_to_date(self.get_definition_path(), fingerprint):
+            IStatusMessage(self.request).add(
+                _(u'info_workflow_up_to_date',
+                  default=u'The workflow definition ${path} is up to date.',
+                  mapping={'path': self.get_definition_path()}))
+            return True
+
         generator = getUtility(IWorkflowGenerator)
         try:
             generator(self.workflow_name(), self.specification)
@@ -113,6 +138,7 @@ class SpecDetails(BrowserView):
         else:
             with open(self.get_definition_path(), 'w+') as result_file:
                 generator.write(result_file)
+            write_fingerprint(self.get_definition_path(), fingerprint)
 
             IStatusMessage(self.request).add(
                 _(u'info_workflow_generated',
@@ -128,6 +154,9 @@ class SpecDetails(BrowserView):
         if not self.write_workflow():
             return self.reload()
 
+        updater = getUtility(IWorkflowSecurityUpdater)
+        old_permission_map = updater.get_permission_map(self.workflow_name())
+
         setup_tool = getToolByName(self.context, 'portal_setup')
         profile_id = self._find_profile_name_for_workflow()
         import_context = setup_tool._getImportContext(
@@ -142,8 +171,29 @@ class SpecDetails(BrowserView):
               default=u'Workflow ${wfname} successfully imported.',
               mapping={'wfname': self.workflow_name()}))
 
+        self.update_changed_states_security(old_permission_map)
         return self.reload()
 
+    def update_changed_states_security(self, old_permission_map):
+        """Updates the security of the objects in the states whose
+        permission roles differ from the `old_permission_map`.
+        """
+        updater = getUtility(IWorkflowSecurityUpdater)
+        changed_states = updater.get_changed_states(
+            old_permission_map,
+            updater.get_permission_map(self.workflow_name()))
+
+        if changed_states:
+            updated_objects = updater.update_batched(self.workflow_name(),
+                                                     states=changed_states)
+        else:
+            updated_objects = 0
+
+        IStatusMessage(self.request).add(
+            _(u'info_security_updated',
+              default=u'Security update: ${amount} objects updated.',
+              mapping={'amount': updated_objects}))
+
     def update_security(self):
         wftool = getToolByName(self.context, 'portal_workflow')
         updated_objects = wftool.updateRoleMappings()
@@ -153,6 +203,31 @@ class SpecDetails(BrowserView):
               default=u'Security update: ${amount} objects updated.',
               mapping={'amount': updated_objects}))
 
+    def update_workflow_security(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updated_objects = updater.update_batched(self.workflow_name())
+
+        IStatusMessage(self.request).add(
+            _(u'info_security_updated',
+              default=u'Security update: ${amount} objects updated.',
+              mapping={'amount': updated_objects}))
+
+    def resume_workflow_security(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updated_objects = updater.resume(self.workflow_name())
+
+        IStatusMessage(self.request).add(
+            _(u'info_security_updated',
+              default=u'Security update: ${amount} objects updated.',
+              mapping={'amount': updated_objects}))
+
+    def security_update_progress(self):
+        """Returns the progress of an unfinished security update of this
+        workflow or `None`.
+        """
+        updater = getUtility(IWorkflowSecurityUpdater)
+        return updater.get_progress(self.workflow_name())
+
     def _get_or_create_workflow_obj(self):
         wftool = getToolByName(self.context, 'portal_workflow')
         name = self.workflow_name()
@@ -168,6 +243,11 @@ class SpecDetails(BrowserView):
         return wftool[name]
 
     def _find_profile_name_for_workflow(self):
+        if self._profile_name is None:
+            self._profile_name = self._lookup_profile_name_for_workflow()
+        return self._profile_name
+
+    def _lookup_profile_name_for_workflow(self):
         setup_tool = getToolByName(self.context, 'portal_setup')
         profile_path = os.path.abspath(os.path.join(
                 os.path.dirname(self.get_definition_path()),
@@ -181,22 +261,18 @@ class SpecDetails(BrowserView):
                 self.get_definition_path()))
 
     def _load_specification(self):
-        parser = getUtility(IWorkflowSpecificationParser)
-        path = self.get_spec_path()
+        try:
+            return get_specification(self.get_spec_path())
+        except Exception, exc:
+            getSite().error_log.raising(sys.exc_info())
 
-        with open(path) as specfile:
-            try:
-                return parser(specfile)
-            except Exception, exc:
-                getSite().error_log.raising(sys.exc_info())
-
-                IStatusMessage(self.request).add(
-                    _(u'error_parsing_error',
-                      default=u'The specification file could not be'
-                      u' parsed: ${error}',
-                      mapping={'error': str(exc).decode('utf-8')}),
-                    type='error')
-                return None
+            IStatusMessage(self.request).add(
+                _(u'error_parsing_error',
+                  default=u'The specification file could not be'
+                  u' parsed: ${error}',
+                  mapping={'error': str(exc).decode('utf-8')}),
+                type='error')
+            return None
 
     def is_workflow_installed(self):
         wftool = getToolByName(self.context, 'portal_workflow')
@@ -213,6 +289,14 @@ class SpecDetails(BrowserView):
             return specfile.read()
 
     def get_spec_path(self):
+        """Path to the specification file. The path is resolved once per
+        view instance, which is once per request.
+        """
+        if self._spec_path is None:
+            self._spec_path = self._resolve_spec_path()
+        return self._spec_path
+
+    def _resolve_spec_path(self):
         discovery = getMultiAdapter((self.context, self.request),
                                     IWorkflowSpecificationDiscovery)
 
@@ -1,5 +1,10 @@
+from Products.CMFPlone.PloneBatch import Batch
+from Products.ZCatalog.Lazy import LazyMap
+from Products.statusmessages.interfaces import IStatusMessage
+from ftw.lawgiver import _
+from ftw.lawgiver.interfaces import IBatchWorkflowGenerator
 from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
-from ftw.lawgiver.wdl.interfaces import IWorkflowSpecificationParser
+from ftw.lawgiver.wdl.parser import read_specification_header
 from zope.component import getMultiAdapter
 from zope.component import getUtility
 from zope.publisher.browser import BrowserView
@@ -8,18 +13,96 @@ import os.path
 
 class ListSpecifications(BrowserView):
 
+    batch_size = 50
+
+    def __call__(self, *args, **kwargs):
+        if 'write_all_workflows' in self.request.form:
+            self.write_all_workflows()
+            return self.request.RESPONSE.redirect(self.request.URL)
+
+        return self.index()
+
+    def write_all_workflows(self):
+        discovery = getMultiAdapter((self.context, self.request),
+                                    IWorkflowSpecificationDiscovery)
+        results = getUtility(IBatchWorkflowGenerator)(discovery.discover())
+        messages = IStatusMessage(self.request)
+
+        for result in results:
+            if result['error'] is None:
+                continue
+
+            messages.add(
+                _(u'error_while_generating_workflow_in_batch',
+                  default=u'Error while generating the workflow'
+                  u' ${wfname}: ${msg}',
+                  mapping={'wfname': result['workflow_id'],
+                           'msg': result['error'].decode('utf-8')}),
+                type='error')
+
+        written = [result for result in results
+                   if result['error'] is None and not result['up_to_date']]
+        duration = sum(result['duration'] for result in results)
+        messages.add(
+            _(u'info_workflows_generated',
+              default=u'${amount} workflow definitions generated in'
+              u' ${duration} seconds.',
+              mapping={'amount': len(written),
+                       'duration': '%.2f' % duration}))
+
+        up_to_date = [result for result in results if result['up_to_date']]
+        if up_to_date:
+            messages.add(
+                _(u'info_workflows_up_to_date',
+                  default=u'${amount} workflow definitions are up to date.',
+                  mapping={'amount': len(up_to_date)}))
+
+        return results
+
     def specifications(self):
+        """Returns the specification items sorted by workflow name.
+        Unless the specifications are filtered, the items are built lazily
+        so that only the headers of the specifications which are actually
+        shown are read.
+        """
         discovery = getMultiAdapter((self.context, self.request),
                                     IWorkflowSpecificationDiscovery)
+        paths = sorted(discovery.discover(), key=self._get_workflow_name)
+
+        filter_text = self.filter_text().lower()
+        if not filter_text:
+            return LazyMap(self._get_spec_item, paths)
+
+        return [spec for spec in map(self._get_spec_item, paths)
+                if filter_text in spec['link_text'].lower()
+                or filter_text in spec['description'].lower()]
 
-        specs = map(self._get_spec_item, discovery.discover())
-        return sorted(specs, key=lambda spec: spec['link_text'])
+    def batch(self):
+        b_start = self._get_int_from_form('b_start', 0, minimum=0)
+        b_size = self._get_int_from_form('b_size', self.batch_size,
+                                         minimum=1)
+        return Batch(self.specifications(), b_size, b_start)
+
+    def filter_text(self):
+        return self.request.form.get('filter', '').strip()
+
+    def _get_int_from_form(self, name, default, minimum):
+        try:
+            value = int(self.request.form.get(name, default))
+        except (TypeError, ValueError):
+            return default
+        if value < minimum:
+            return default
+        return value
+
+    def _get_workflow_name(self, path):
+        return os.path.basename(os.path.dirname(path))
 
     def _get_spec_item(self, path):
         discovery = getMultiAdapter((self.context, self.request),
                                     IWorkflowSpecificationDiscovery)
 
-        workflow_name = os.path.basename(os.path.dirname(path))
+        workflow_name = self._get_workflow_name(path)
         item = {'link_text': workflow_name,
                 'description': '',
                 'href': '/'.join((
@@ -27,21 +110,19 @@ class ListSpecifications(BrowserView):
                     '@@lawgiver-spec-details',
                     discovery.hash(path)))}
 
-        specification = self._get_specification_by_path(path)
-        if specification and specification.title:
-            item['link_text'] = '%s (%s)' % (specification.title,
+        header = self._get_specification_header_by_path(path)
+        if header and header['title']:
+            item['link_text'] = '%s (%s)' % (header['title'],
                                              workflow_name)
 
-        if specification and specification.description:
-            item['description'] = specification.description
+        if header and header['description']:
+            item['description'] = header['description']
 
         return item
 
-    def _get_specification_by_path(self, path):
-        """Returns the parsed specification for a path pointing to a
-        specification.txt
+    def _get_specification_header_by_path(self, path):
+        """Returns the title and the description of the specification at
+        `path`, without parsing the whole specification.
         """
-        parser = getUtility(IWorkflowSpecificationParser)
-
         with open(path) as specfile:
-            return parser(specfile, silent=True)
+            return read_specification_header(specfile)
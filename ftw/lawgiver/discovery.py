@@ -1,5 +1,6 @@
 from Products.CMFCore.utils import getToolByName
 from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
+from ftw.lawgiver.watcher import SpecificationFileWatcher
 from operator import itemgetter
 from operator import methodcaller
 from zope.component import adapts
@@ -12,6 +13,29 @@ import os
 FILENAME = 'specification.txt'
 
 
+class SpecificationHashIndex(object):
+    """A process wide hash -> path index of the discovered specifications.
+    The index is only valid for a key built of the profile paths and the
+    modification times of their workflows directories.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.paths = {}
+
+    def get(self, key, hash_):
+        if key != self.key:
+            return None
+        return self.paths.get(hash_)
+
+    def update(self, key, paths):
+        self.paths = paths
+        self.key = key
+
+
+HASH_INDEX = SpecificationHashIndex()
+
+
 class WorkflowSpecificationDiscovery(object):
     implements(IWorkflowSpecificationDiscovery)
     adapts(Interface, Interface)
@@ -21,19 +45,44 @@ class WorkflowSpecificationDiscovery(object):
         self.request = request
 
     def discover(self):
+        profile_paths = self._get_profile_paths()
+        key = self._get_index_key(profile_paths)
+
         result = set()
         map(result.update,
-            map(self._get_specification_files, self._get_profile_paths()))
-        return list(result)
+            map(self._get_specification_files, profile_paths))
+        result = list(result)
+
+        HASH_INDEX.update(key, dict((self.hash(path), path)
+                                    for path in result))
+        return result
 
     def hash(self, path):
         return hashlib.md5(path).hexdigest()
 
     def unhash(self, hash_):
-        for path in self.discover():
-            if self.hash(path) == hash_:
-                return path
-        return None
+        key = self._get_index_key(self._get_profile_paths())
+        path = HASH_INDEX.get(key, hash_)
+        if path is not None and os.path.isfile(path):
+            return path
+
+        # Specifications may have been added to existing workflow
+        # directories, which does not change the index key.
+        # The key may have changed during the discovery, so we look up the
+        # hash in the discovered paths.
+        return dict((self.hash(path), path)
+                    for path in self.discover()).get(hash_)
+
+    def _get_index_key(self, profile_paths):
+        key = []
+        for profile_directory in sorted(profile_paths):
+            try:
+                mtime = os.stat(os.path.join(profile_directory,
+                                             'workflows')).st_mtime
+            except OSError:
+                mtime = None
+            key.append((profile_directory, mtime))
+        return tuple(key)
 
     def _get_specification_files(self, profile_directory):
         workflows_dir = os.path.join(profile_directory, 'workflows')
@@ -49,3 +98,27 @@ class WorkflowSpecificationDiscovery(object):
         setup_tool = getToolByName(self.context, 'portal_setup')
         paths = map(itemgetter('path'), setup_tool.listProfileInfo())
         return map(str, filter(methodcaller('startswith', '/'), paths))
+
+
+WATCHER = None
+
+
+def get_watcher():
+    global WATCHER
+    if WATCHER is None:
+        WATCHER = SpecificationFileWatcher()
+    return WATCHER
+
+
+class CachedWorkflowSpecificationDiscovery(WorkflowSpecificationDiscovery):
+    """A discovery which keeps the specification files of each profile in
+    memory and only scans the file system again when it has changed.
+    It uses inotify when `pyinotify` is installed and falls back to
+    comparing the modification times of the workflow directories.
+    """
+
+    def _get_specification_files(self, profile_directory):
+        scanner = super(CachedWorkflowSpecificationDiscovery,
+                        self)._get_specification_files
+        return get_watcher().get_specification_files(profile_directory,
+                                                     scanner)
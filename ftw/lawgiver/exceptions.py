@@ -2,4 +2,10 @@
 
 class ParsingError(Exception):
     """An error occured while parsing the specification.
+    The `line` and `column` of the problem are set when known.
     """
+
+    def __init__(self, message, line=None, column=None):
+        super(ParsingError, self).__init__(message)
+        self.line = line
+        self.column = column
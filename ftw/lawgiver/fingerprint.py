@@ -0,0 +1,153 @@
+from ftw.lawgiver.interfaces import IActionGroupRegistry
+from ftw.lawgiver.interfaces import IPermissionCollector
+from threading import Lock
+from zope.component import getUtility
+import hashlib
+import os
+import pkg_resources
+
+
+_LAWGIVER_VERSION = []
+
+FINGERPRINT_FILENAME = 'definition.fingerprint'
+
+
+def get_lawgiver_version():
+    """Returns the version of the installed ftw.lawgiver distribution or
+    ``unknown`` when it is not installed as distribution.
+    """
+    if not _LAWGIVER_VERSION:
+        try:
+            version = pkg_resources.get_distribution('ftw.lawgiver').version
+        except pkg_resources.DistributionNotFound:
+            version = 'unknown'
+        _LAWGIVER_VERSION.append(version)
+
+    return _LAWGIVER_VERSION[0]
+
+
+def calculate_fingerprint(workflow_id, specification_data,
+                          managed_permissions, action_groups):
+    """Returns a hash over everything the generated definition of a workflow
+    depends on: the workflow id, the raw specification, the managed
+    permissions, the action groups index of the workflow and the version of
+    ftw.lawgiver.
+    """
+    fingerprint = hashlib.sha1()
+
+    def update(*values):
+        for value in values:
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            fingerprint.update(value)
+            fingerprint.update('\0')
+
+    update('version', get_lawgiver_version())
+    update('workflow', workflow_id)
+    update('specification', specification_data)
+    update('permissions', *sorted(managed_permissions))
+
+    for group in sorted(action_groups.permissions_by_group):
+        update('group', group,
+               *sorted(action_groups.permissions_by_group[group]))
+
+    update('ignored', *sorted(action_groups.ignored))
+    return fingerprint.hexdigest()
+
+
+def get_fingerprint(workflow_id, specification_path):
+    """Calculates the fingerprint of a workflow with the managed permissions
+    and action groups currently registered.
+    """
+    with open(specification_path) as specfile:
+        specification_data = specfile.read()
+
+    return calculate_fingerprint(
+        workflow_id,
+        specification_data,
+        getUtility(IPermissionCollector).collect(workflow_id),
+        getUtility(IActionGroupRegistry).get_index(workflow_id))
+
+
+class FingerprintCache(object):
+    """A process wide cache of the fingerprints of specifications.
+    A cached fingerprint is reused as long as the modification time and the
+    size of the specification file and the action group index of the
+    workflow do not change.
+    The managed permissions are not part of the key, since permissions are
+    registered when Zope starts.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = Lock()
+
+    def get(self, workflow_id, specification_path):
+        stat = os.stat(specification_path)
+        stamp = (stat.st_mtime, stat.st_size)
+        action_groups = getUtility(IActionGroupRegistry).get_index(
+            workflow_id)
+        key = (workflow_id, specification_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp \
+                    and entry[1] is action_groups:
+                self.hits += 1
+                return entry[2]
+
+            self.misses += 1
+
+        fingerprint = get_fingerprint(workflow_id, specification_path)
+
+        with self._lock:
+            self._entries[key] = (stamp, action_groups, fingerprint)
+
+        return fingerprint
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+FINGERPRINT_CACHE = FingerprintCache()
+
+
+def get_cached_fingerprint(workflow_id, specification_path):
+    """Returns the fingerprint of a workflow from the process wide
+    fingerprint cache.
+    """
+    return FINGERPRINT_CACHE.get(workflow_id, specification_path)
+
+
+def get_fingerprint_path(definition_path):
+    return os.path.join(os.path.dirname(definition_path),
+                        FINGERPRINT_FILENAME)
+
+
+def read_fingerprint(definition_path):
+    """Returns the fingerprint stored next to the `definition_path` or `None`.
+    """
+    path = get_fingerprint_path(definition_path)
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as fingerprint_file:
+        return fingerprint_file.read().strip()
+
+
+def write_fingerprint(definition_path, fingerprint):
+    with open(get_fingerprint_path(definition_path), 'w+') as fingerprint_file:
+        fingerprint_file.write(fingerprint + '\n')
+
+
+def is_up_to_date(definition_path, fingerprint):
+    """Checks whether the definition at `definition_path` exists and was
+    generated from the same input as `fingerprint` was calculated.
+    """
+    return os.path.exists(definition_path) and \
+        read_fingerprint(definition_path) == fingerprint
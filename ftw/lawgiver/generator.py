@@ -1,47 +1,63 @@
+from collections import defaultdict
+from copy import deepcopy
 from ftw.lawgiver.interfaces import IActionGroupRegistry
 from ftw.lawgiver.interfaces import IPermissionCollector
 from ftw.lawgiver.interfaces import IWorkflowGenerator
 from ftw.lawgiver.variables import VARIABLES
 from lxml import etree
-from lxml import html
 from plone.i18n.normalizer.interfaces import INormalizer
 from zope.component import getUtility
 from zope.interface import implements
 
 
+# The variables are static - we parse them once and copy them into each
+# generated workflow.
+VARIABLES_PROTOTYPE = etree.fromstring('<variables>%s</variables>' % (
+        VARIABLES))
+
+
 class WorkflowGenerator(object):
 
     implements(IWorkflowGenerator)
 
-    def __init__(self):
+    def __init__(self, managed_permissions=None, action_groups=None,
+                 normalizer=None):
+        """By default the managed permissions, the action groups and the
+        normalizer are looked up in the component registry.
+        A snapshot of them can be passed in instead, so that the generator
+        also works without component registry (e.g. in a worker process).
+        """
+        self._snapshot_normalizer = normalizer
+        self.set_snapshot(managed_permissions, action_groups)
+
         self.workflow_id = None
         self.specification = None
         self.managed_permissions = None
+        self.action_groups = None
         self.document = None
+        self._status_ids = None
+        self._worklist_ids = None
+        self._transition_ids = None
+        self._normalizer = None
+        self._normalized_titles = {}
+
+    def set_snapshot(self, managed_permissions=None, action_groups=None):
+        """Replaces the snapshot of the managed permissions and the action
+        groups, e.g. for generating the next workflow with the same
+        generator. `None` looks them up in the component registry again.
+        """
+        self._snapshot_permissions = managed_permissions
+        self._snapshot_action_groups = action_groups
 
     def __call__(self, workflow_id, specification):
-        self.workflow_id = workflow_id
-        self.specification = specification
-        self.managed_permissions = sorted(
-            getUtility(IPermissionCollector).collect(workflow_id))
+        self._prepare(workflow_id, specification)
 
         doc = self._create_document()
         self.document = doc
 
-        status_nodes = {}
-        for status in sorted(specification.states.values(),
-                             key=lambda status: status.title):
-            status_nodes[status] = self._add_status(doc, status)
-
-        transition_nodes = {}
-        for transition in sorted(specification.transitions,
-                                 key=lambda transition: transition.title):
-            transition_nodes[transition] = self._add_transition(
-                doc, transition)
-
-        self._apply_specification_statements(status_nodes, transition_nodes)
+        for node in self._generate_nodes():
+            doc.append(node)
 
-        self._add_variables(doc)
         return self
 
     def write(self, result_stream):
@@ -55,8 +71,30 @@ class WorkflowGenerator(object):
                                                xml_declaration=True,
                                                encoding='utf-8')
 
+    def stream(self, workflow_id, specification, result_stream):
+        if not hasattr(etree, 'xmlfile'):
+            # Incremental serialization requires lxml >= 3.1.
+            return self(workflow_id, specification).write(result_stream)
+
+        self._prepare(workflow_id, specification)
+        self.document = None
+        root = self._create_document()
+
+        with etree.xmlfile(result_stream, encoding='UTF-8') as xmlfile:
+            xmlfile.write_declaration()
+
+            with xmlfile.element(root.tag, root.attrib):
+                for node in root:
+                    xmlfile.write(node)
+
+                for node in self._generate_nodes():
+                    xmlfile.write(node)
+
+        result_stream.write('\n')
+
     def get_translations(self, workflow_id, specification):
         self.workflow_id = workflow_id
+        self._build_id_table(specification)
 
         result = {}
 
@@ -71,6 +109,7 @@ class WorkflowGenerator(object):
 
     def get_states(self, workflow_id, specification):
         self.workflow_id = workflow_id
+        self._build_id_table(specification)
         result = []
 
         for status in specification.states.values():
@@ -78,6 +117,47 @@ class WorkflowGenerator(object):
 
         return result
 
+    def get_permission_matrix(self, workflow_id, specification):
+        self._prepare(workflow_id, specification)
+        result = {}
+
+        for status in specification.states.values():
+            statements = set(status.statements) | set(
+                specification.generals)
+            role_inheritance = RoleInheritanceGraph(
+                self._get_merged_role_inheritance(status))
+            status_stmts = self._distinguish_statements(statements)[0]
+
+            groups_per_role = defaultdict(set)
+            for action_group, roles in self._get_roles_per_action_group(
+                    status_stmts, role_inheritance).items():
+                for role in roles:
+                    groups_per_role[role].add(action_group)
+
+            result[self._status_id(status)] = dict(
+                (role, sorted(groups))
+                for role, groups in groups_per_role.items())
+
+        return result
+
+    def _prepare(self, workflow_id, specification):
+        self.workflow_id = workflow_id
+        self.specification = specification
+
+        if self._snapshot_permissions is not None:
+            self.managed_permissions = sorted(self._snapshot_permissions)
+        else:
+            self.managed_permissions = sorted(
+                getUtility(IPermissionCollector).collect(workflow_id))
+
+        if self._snapshot_action_groups is not None:
+            self.action_groups = self._snapshot_action_groups
+        else:
+            self.action_groups = getUtility(IActionGroupRegistry).get_index(
+                workflow_id)
+
+        self._build_id_table(specification)
+
     def _create_document(self):
         root = etree.Element("dc-workflow")
         root.set('workflow_id', self.workflow_id)
@@ -97,24 +177,70 @@ class WorkflowGenerator(object):
 
         return root
 
-    def _add_status(self, doc, status):
-        node = etree.SubElement(doc, 'state')
+    def _generate_nodes(self):
+        """Generates the state, transition, worklist and variable nodes of the
+        workflow in document order. Each node is complete when it is
+        generated, so that it can be written right away.
+        """
+
+        states = sorted(self.specification.states.values(),
+                        key=lambda status: status.title)
+        transition_statements = {}
+        per_status_role_inheritance = {}
+
+        for status in states:
+            statements = set(status.statements) | set(
+                self.specification.generals)
+
+            role_inheritance = RoleInheritanceGraph(
+                self._get_merged_role_inheritance(status))
+            per_status_role_inheritance[status] = role_inheritance
+
+            status_stmts, trans_stmts = self._distinguish_statements(
+                statements)
+            transition_statements[status] = set(trans_stmts)
+
+            node = self._create_status(status)
+            self._apply_status_statements(node, status_stmts,
+                                          role_inheritance)
+            yield node
+
+        for transition in sorted(self.specification.transitions,
+                                 key=lambda transition: transition.title):
+            node = self._create_transition(transition)
+            self._apply_transition_statements(
+                node, transition,
+                transition_statements.get(transition.src_status, ()),
+                per_status_role_inheritance.get(
+                    transition.src_status, RoleInheritanceGraph([])))
+            yield node
+
+        for status in states:
+            node = self._create_worklist_when_necessary(
+                status, per_status_role_inheritance[status])
+            if node is not None:
+                yield node
+
+        for node in self._get_variables():
+            yield node
+
+    def _create_status(self, status):
+        node = etree.Element('state')
         node.set('state_id', self._status_id(status))
         node.set('title', status.title.decode('utf-8'))
 
-        for transition in self.specification.transitions:
-            assert transition.src_status is not None, \
-                '%s has improperly defined src_status' % str(transition)
-            if transition.src_status != status:
-                continue
-
+        for transition in self.specification.get_transitions_by_src_status(
+                status):
             exit_trans = etree.SubElement(node, 'exit-transition')
             exit_trans.set('transition_id', self._transition_id(transition))
 
         return node
 
-    def _add_transition(self, doc, transition):
-        node = etree.SubElement(doc, 'transition')
+    def _create_transition(self, transition):
+        assert transition.src_status is not None, \
+            '%s has improperly defined src_status' % str(transition)
+
+        node = etree.Element('transition')
 
         node.set('new_state', self._status_id(transition.dest_status))
         node.set('title', transition.title.decode('utf-8'))
@@ -138,79 +264,51 @@ class WorkflowGenerator(object):
 
         return node
 
-    def _apply_specification_statements(self, status_nodes,
-                                        transition_nodes):
-        transition_statements = dict([(status, set()) for status in
-                                      status_nodes.keys()])
-
-        per_status_role_inheritance = {}
-
-        for status, snode in status_nodes.items():
-            statements = set(status.statements) | set(
-                self.specification.generals)
-
-            role_inheritance = self._get_merged_role_inheritance(status)
-            per_status_role_inheritance[status] = role_inheritance
-
-            status_stmts, trans_stmts = self._distinguish_statements(
-                statements)
-            transition_statements[status].update(trans_stmts)
-
-            self._apply_status_statements(snode, status_stmts,
-                                          role_inheritance)
-
-            self._add_worklist_when_necessary(status, role_inheritance)
-
-        self._apply_transition_statements(transition_statements,
-                                          transition_nodes,
-                                          per_status_role_inheritance)
-
     def _apply_status_statements(self, snode, statements, role_inheritance):
+        roles_per_action_group = self._get_roles_per_action_group(
+            statements, role_inheritance)
+
         for permission in self.managed_permissions:
             pnode = etree.SubElement(snode, 'permission-map')
             pnode.set('name', permission)
             pnode.set('acquired', 'False')
 
-            roles = self._get_roles_for_permission(permission, statements)
-            roles = resolve_inherited_roles(roles, role_inheritance)
+            action_group = self.action_groups.get_action_group(permission)
+            roles = roles_per_action_group.get(action_group, ())
 
             for role in roles:
                 rolenode = etree.SubElement(pnode, 'permission-role')
                 rolenode.text = role.decode('utf-8')
 
-    def _apply_transition_statements(self, statements, nodes,
-                                     per_status_role_inheritance):
-        for transition, node in nodes.items():
-            guards = etree.SubElement(node, 'guard')
+    def _apply_transition_statements(self, node, transition, statements,
+                                     role_inheritance):
+        guards = etree.SubElement(node, 'guard')
 
-            role_inheritance = per_status_role_inheritance.get(
-                transition.src_status, [])
-
-            roles = []
-            for customer_role, action in statements[transition.src_status]:
-                if action != transition.title:
-                    continue
+        roles = []
+        for customer_role, action in statements:
+            if action != transition.title:
+                continue
 
-                role = self.specification.role_mapping[customer_role]
-                roles.append(role)
+            role = self.specification.role_mapping[customer_role]
+            roles.append(role)
 
-            roles = resolve_inherited_roles(roles, role_inheritance)
+        roles = role_inheritance.resolve(roles)
 
-            for role in roles:
-                rolenode = etree.SubElement(guards, 'guard-role')
-                rolenode.text = role.decode('utf-8')
+        for role in roles:
+            rolenode = etree.SubElement(guards, 'guard-role')
+            rolenode.text = role.decode('utf-8')
 
-            if len(guards) == 0:
-                # Disable the transition by a condition guard, because there
-                # were no statements about who can do the transtion.
-                xprnode = etree.SubElement(guards, 'guard-expression')
-                xprnode.text = u'python: False'
+        if len(guards) == 0:
+            # Disable the transition by a condition guard, because there
+            # were no statements about who can do the transtion.
+            xprnode = etree.SubElement(guards, 'guard-expression')
+            xprnode.text = u'python: False'
 
-    def _add_worklist_when_necessary(self, status, role_inheritance):
+    def _create_worklist_when_necessary(self, status, role_inheritance):
         if not status.worklist_viewers:
-            return False
+            return None
 
-        worklist = etree.SubElement(self.document, 'worklist')
+        worklist = etree.Element('worklist')
         worklist.set('title', '')
         worklist.set('worklist_id', self._worklist_id(status))
 
@@ -229,23 +327,30 @@ class WorkflowGenerator(object):
 
         roles = [self.specification.role_mapping[crole]
                  for crole in status.worklist_viewers]
-        roles = resolve_inherited_roles(roles, role_inheritance)
+        roles = role_inheritance.resolve(roles)
 
         for role in roles:
             rolenode = etree.SubElement(guards, 'guard-role')
             rolenode.text = role.decode('utf-8')
 
-    def _get_roles_for_permission(self, permission, statements):
-        agregistry = getUtility(IActionGroupRegistry)
-        action_group = agregistry.get_action_group_for_permission(
-            permission, self.workflow_id)
+        return worklist
+
+    def _get_roles_per_action_group(self, statements, role_inheritance):
+        """Compiles the action group statements of a status into a dict,
+        where the key is the action group and the value is the sorted list
+        of Plone roles (including inherited roles) having this action group.
+        """
+
+        plone_roles = defaultdict(list)
+        for customer_role, action_group in statements:
+            plone_roles[action_group].append(
+                self.specification.role_mapping[customer_role])
 
-        customer_roles = (role for (role, group) in statements
-                          if group == action_group)
+        result = {}
+        for action_group, roles in plone_roles.items():
+            result[action_group] = role_inheritance.resolve(sorted(roles))
 
-        plone_roles = (self.specification.role_mapping[cr]
-                       for cr in customer_roles)
-        return sorted(plone_roles)
+        return result
 
     def _distinguish_statements(self, statements):
         """Accepts a list of statements (tuples with customer role and action)
@@ -256,12 +361,10 @@ class WorkflowGenerator(object):
         action_group_statements = []
         transition_statements = []
 
-        agregistry = getUtility(IActionGroupRegistry)
-        action_groups = agregistry.get_action_groups_for_workflow(
-            self.workflow_id)
+        action_groups = self.action_groups.permissions_by_group
 
         for customer_role, action in statements:
-            if self._find_transition_by_title(action):
+            if self.specification.get_transition_by_title(action):
                 transition_statements.append((customer_role, action))
 
             elif action in action_groups:
@@ -274,37 +377,60 @@ class WorkflowGenerator(object):
 
         return action_group_statements, transition_statements
 
-    def _find_transition_by_title(self, title):
-        for transition in self.specification.transitions:
-            if transition.title == title:
-                return transition
-        return None
+    def _get_variables(self):
+        return [deepcopy(node) for node in VARIABLES_PROTOTYPE]
 
-    def _add_variables(self, doc):
-        # The variables are static - we use always the same.
-        for node in html.fragments_fromstring(VARIABLES):
-            doc.append(node)
+    def _build_id_table(self, specification):
+        """Generates the IDs of all states, worklists and transitions of the
+        `specification` for the current workflow id.
+        Normalized titles are kept as long as the normalizer utility does not
+        change, so that each title is normalized only once, also over
+        multiple generated workflows.
+        """
+        normalizer = self._snapshot_normalizer or getUtility(INormalizer)
+        if normalizer is not self._normalizer:
+            self._normalizer = normalizer
+            self._normalized_titles = {}
+
+        normalized = self._normalized_titles
+
+        def normalize(text):
+            if text not in normalized:
+                normalized[text] = self._normalize(text, normalizer)
+            return normalized[text]
+
+        self._status_ids = {}
+        self._worklist_ids = {}
+        for status in specification.states.values():
+            self._status_ids[status] = '%s--STATUS--%s' % (
+                self.workflow_id, normalize(status.title))
+            self._worklist_ids[status] = '%s--WORKLIST--%s' % (
+                self.workflow_id, normalize(status.title))
+
+        self._transition_ids = {}
+        for transition in specification.transitions:
+            self._transition_ids[transition] = (
+                '%s--TRANSITION--%s--%s_%s' % (
+                    self.workflow_id,
+                    normalize(transition.title),
+                    normalize(transition.src_status.title),
+                    normalize(transition.dest_status.title)))
 
     def _transition_id(self, transition):
-        return '%s--TRANSITION--%s--%s_%s' % (
-            self.workflow_id,
-            self._normalize(transition.title),
-            self._normalize(transition.src_status.title),
-            self._normalize(transition.dest_status.title))
+        return self._transition_ids[transition]
 
     def _status_id(self, status):
-        return '%s--STATUS--%s' % (
-            self.workflow_id, self._normalize(status.title))
+        return self._status_ids[status]
 
     def _worklist_id(self, status):
-        return '%s--WORKLIST--%s' % (
-            self.workflow_id, self._normalize(status.title))
+        return self._worklist_ids[status]
 
-    def _normalize(self, text):
+    def _normalize(self, text, normalizer=None):
         if isinstance(text, str):
             text = text.decode('utf-8')
 
-        normalizer = getUtility(INormalizer)
+        if normalizer is None:
+            normalizer = getUtility(INormalizer)
         result = normalizer.normalize(text)
         return result.decode('utf-8')
 
@@ -328,29 +454,68 @@ class WorkflowGenerator(object):
         return result
 
 
-def resolve_inherited_roles(roles, role_inheritance):
-    if not role_inheritance:
-        return roles
+class RoleInheritanceGraph(object):
+    """A compiled role inheritance graph.
 
-    roles = roles[:]
+    The ``role_inheritance`` is a list of two-tuples of Plone roles, where
+    the first role inherits all the actions of the second role:
+    ``[('inheritor', 'base'), ('inheritor2', 'base')]``.
 
-    # role_inheritance is: [('inheritor', 'base'), ('inheritor2', 'base')]
-    # make: {'base': ['inheritor', 'inheritor2']}
-    base_roles = set(zip(*role_inheritance)[1])
-    mapping = dict([(key, []) for key in base_roles])
-    for inheritor, base in role_inheritance:
-        mapping[base].append(inheritor)
+    The transitive closure is calculated once when the graph is created,
+    so that resolving the inherited roles is a lookup per role.
+    Circular inheritance is allowed: all roles in a cycle inherit from
+    each other.
+    """
 
-    def _recurse(role, mapping, result):
-        if role not in mapping:
-            return
+    def __init__(self, role_inheritance):
+        inheritors = defaultdict(set)
+        for inheritor, base in role_inheritance:
+            inheritors[base].add(inheritor)
 
-        for alias in mapping[role]:
-            if alias not in result:
-                result.append(alias)
-                _recurse(alias, mapping, result)
+        self._closure = dict((base, self._walk(base, inheritors))
+                             for base in inheritors)
 
-    for role in roles[:]:
-        _recurse(role, mapping, roles)
+    def get_inheritors(self, role):
+        """Returns a set of all roles inheriting from `role`, directly or
+        transitively.
+        """
+        return self._closure.get(role, frozenset())
+
+    def get_cyclic_roles(self):
+        """Returns a sorted list of roles which are part of an inheritance
+        cycle.
+        """
+        return sorted(role for role, inheritors in self._closure.items()
+                      if role in inheritors)
+
+    def resolve(self, roles):
+        """Returns a sorted list of the `roles` extended with all roles
+        inheriting from them.
+        """
+        if not self._closure:
+            return roles
+
+        result = list(roles)
+        seen = set(roles)
+        for role in roles:
+            for inheritor in self._closure.get(role, ()):
+                if inheritor not in seen:
+                    seen.add(inheritor)
+                    result.append(inheritor)
+
+        return sorted(result)
+
+    def _walk(self, base, inheritors):
+        result = set()
+        stack = [base]
+        while stack:
+            for inheritor in inheritors.get(stack.pop(), ()):
+                if inheritor not in result:
+                    result.add(inheritor)
+                    stack.append(inheritor)
 
-    return sorted(roles)
+        return frozenset(result)
+
+
+def resolve_inherited_roles(roles, role_inheritance):
+    return RoleInheritanceGraph(role_inheritance).resolve(roles)
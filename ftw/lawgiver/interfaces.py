@@ -47,6 +47,14 @@ class IActionGroupRegistry(Interface):
         workflow.
         """
 
+    def get_index(workflow_name=None):
+        """Returns a precompiled, read-only lookup index for the workflow
+        `workflow_name`, providing `groups_by_permission`,
+        `permissions_by_group` and `ignored`.
+        The index is built on the first query and is discarded whenever
+        the registry is updated.
+        """
+
 
 class IWorkflowGenerator(Interface):
     """The workflow generator utility generates a workflow ``definition.xml``
@@ -70,10 +78,156 @@ class IWorkflowGenerator(Interface):
         specification.
         """
 
+    def get_permission_matrix(workflow_id, specification):
+        """Returns the action groups each role has in each state.
+        The result is a dict where the key is the generated state ID and the
+        value is a dict of Plone roles (including inherited roles) and
+        the sorted list of their action groups.
+        """
+
     def write(result_stream):
         """Writes the previously generated XML to a stream.
         """
 
+    def stream(workflow_id, specification, result_stream):
+        """Converts the ``specification`` into XML and writes it to the
+        ``result_stream`` while generating, without keeping the whole
+        document in memory.
+        The output is the same as when calling the generator and `write`.
+        """
+
+
+class IBatchWorkflowGenerator(Interface):
+    """The batch workflow generator utility generates the workflow
+    definitions of many specifications in one pass.
+    """
+
+    def __call__(specification_paths, processes=1, force=False):
+        """Parses each ``specification.txt`` in ``specification_paths`` and
+        writes the generated ``definition.xml`` next to it.
+        The workflow id is the name of the directory of the specification.
+        The definitions are replaced atomically.
+
+        When ``processes`` is greater than one, the workflows are generated
+        in parallel by a pool of worker processes (``None`` starts one
+        worker per CPU). The workers get a snapshot of the action groups
+        and managed permissions of their workflow.
+
+        A fingerprint of the input is stored next to each definition.
+        Workflows whose fingerprint did not change are not generated again,
+        unless ``force`` is `True`.
+
+        Returns a list of dicts, one per specification, with the keys
+        ``workflow_id``, ``specification_path``, ``definition_path``,
+        ``up_to_date`` (`True` when the generation was skipped),
+        ``duration`` (seconds) and ``error`` (`None` or the error message).
+        """
+
+
+class IWorkflowSecurityUpdater(Interface):
+    """The workflow security updater utility updates the role mappings of
+    the objects of a single workflow, which is a lot faster than updating
+    the whole site with ``portal_workflow.updateRoleMappings()``.
+
+    The objects are looked up in the catalog by the portal types having the
+    workflow in their chain. Objects whose chain does not contain the
+    workflow because of a placeful workflow policy are skipped, objects of
+    other portal types using the workflow placefully are not updated.
+    """
+
+    def update(workflow_id, states=None):
+        """Updates the role mappings of all objects with the workflow
+        `workflow_id`, optionally limited to the objects in one of the
+        `states` (list of state IDs).
+        Returns the amount of updated objects.
+        """
+
+    def update_batched(workflow_id, states=None, batch_size=500):
+        """Updates the same objects as `update`, but in chunks of
+        `batch_size` objects. The transaction is committed and the ZODB
+        cache is minimized after each chunk.
+        The progress is stored on the site, so that an interrupted update
+        can be continued with `resume`.
+        Returns the amount of updated objects.
+        """
+
+    def resume(workflow_id, batch_size=500):
+        """Continues an interrupted batched update of the workflow
+        `workflow_id`. Returns the amount of updated objects of the whole
+        update or 0 if there is nothing to resume.
+        """
+
+    def get_progress(workflow_id):
+        """Returns the progress of an unfinished batched update as dict with
+        the keys ``states``, ``cursor``, ``processed``, ``updated`` and
+        ``total`` or `None` if there is no unfinished update.
+        """
+
+    def create_partitions(workflow_id, states=None, partitions=4,
+                          batch_size=500):
+        """Splits the objects to update into `partitions` UID ranges of
+        about the same size and stores them on the site, so that several
+        ZEO clients can update them in parallel with `work_partitions`.
+        The UIDs are walked in chunks of `batch_size` for finding the
+        ranges. Returns the amount of created partitions.
+        """
+
+    def work_partitions(workflow_id, batch_size=500):
+        """Claims pending partitions of the workflow `workflow_id` one after
+        another and updates their objects in chunks of `batch_size`,
+        committing after each chunk. Returns when no partition is pending.
+        Conflicting chunks are retried from the stored progress.
+        Returns the amount of objects updated by this worker.
+        """
+
+    def get_partitions(workflow_id):
+        """Returns the partitions of the workflow as list of dicts with the
+        keys ``status`` (``pending``, ``running`` or ``done``), ``worker``,
+        ``heartbeat`` (time of the last progress of a running partition),
+        ``processed``, ``updated`` and ``total`` or `None` when there are
+        no partitions.
+        """
+
+    def release_partitions(workflow_id, timeout=1800):
+        """Sets running partitions back to pending when their worker did not
+        report progress for `timeout` seconds (e.g. because it crashed), so
+        that they are continued by the next worker.
+        Returns the amount of released partitions.
+        """
+
+    def finish_partitions(workflow_id):
+        """Removes the partitions when all of them are done and returns the
+        amount of updated objects. Returns `None` when partitions are not
+        done yet.
+        """
+
+    def get_portal_types(workflow_id):
+        """Returns the portal types having the workflow in their chain.
+        """
+
+    def get_query(workflow_id, states=None):
+        """Returns the catalog query for the objects to update.
+        """
+
+    def get_permission_map(workflow_id):
+        """Returns a snapshot of the managed permissions and the permission
+        roles of each state of the installed workflow `workflow_id`, or
+        `None` if the workflow is not installed.
+        """
+
+    def get_changed_states(old_map, new_map):
+        """Compares two permission maps (see `get_permission_map`) and
+        returns the IDs of the states whose permission roles have changed.
+        All states are returned when the managed permissions have changed.
+        """
+
+    def update_object(workflow, obj):
+        """Updates the role mappings of `obj` with the `workflow` object and
+        reindexes its security. Returns `True` if the object has changed.
+        Objects whose workflow chain does not contain the workflow, for
+        instance because of a placeful workflow policy, are skipped.
+        """
+
 
 class IPermissionCollector(Interface):
     """The permission collector utility decides which permissions will be
@@ -150,4 +304,7 @@ class IWorkflowSpecificationDiscovery(Interface):
         """Returns the path to a specification for a hash.
         Only registered paths (which are returned by `discover`) are returned.
         If there is no match `None` is returned.
+        The hashes are looked up in an index, which is updated by `discover`
+        and only rebuilt when the profiles or their workflows directories
+        change.
         """
@@ -27,8 +27,12 @@ class SpecItem(object):
 
 class SpecsListing(Plone):
 
-    def open(self):
-        browser().visit(self.listing_url)
+    def open(self, query=None):
+        url = self.listing_url
+        if query:
+            url = '?'.join((url, query))
+
+        browser().visit(url)
         assert self.get_template_class() == 'template-lawgiver-list-specs', \
             'Not on @@lawgiver-list-specs view!?: %s' % browser().url
 
@@ -124,6 +128,12 @@ class SpecDetails(Plone):
     def button_reindex(self):
         return self.get_button('Update security settings')
 
+    def button_update_workflow_security(self):
+        return self.get_button('Update security of this workflow')
+
+    def button_resume_workflow_security(self):
+        return self.get_button('Resume security update')
+
 class SpecDetailsConfirmation(SpecDetails):
 
     def is_confirmation_dialog_opened(self):
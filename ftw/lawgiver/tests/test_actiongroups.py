@@ -322,3 +322,75 @@ class TestActionGroupRegistry(BaseTest):
             'view',
             registry.get_action_group_for_permission(
                 'List folder contents'))
+
+    def test_index_is_reused_between_queries(self):
+        self.load_map_permissions_zcml(
+            '<lawgiver:map_permissions',
+            '    action_group="view"',
+            '    permissions="View" />')
+
+        registry = self.get_registry()
+        self.assertIs(registry.get_index('foo'), registry.get_index('foo'))
+        self.assertIsNot(registry.get_index('foo'), registry.get_index('bar'))
+
+    def test_index_is_invalidated_when_mapping_permissions(self):
+        self.load_map_permissions_zcml(
+            '<lawgiver:map_permissions',
+            '    action_group="view"',
+            '    permissions="View" />')
+
+        registry = self.get_registry()
+        self.assertEqual(
+            None,
+            registry.get_action_group_for_permission('Modify portal content'))
+
+        self.load_map_permissions_zcml(
+            '<lawgiver:map_permissions',
+            '    action_group="edit"',
+            '    permissions="Modify portal content" />')
+
+        self.assertEqual(
+            'edit',
+            registry.get_action_group_for_permission('Modify portal content'))
+
+        self.assertEqual(
+            {'view': set([u'View']),
+             'edit': set([u'Modify portal content'])},
+            registry.get_action_groups_for_workflow(None))
+
+    def test_index_is_invalidated_when_ignoring_permissions(self):
+        self.load_map_permissions_zcml(
+            '<lawgiver:map_permissions',
+            '    action_group="view"',
+            '    permissions="View" />')
+
+        registry = self.get_registry()
+        self.assertEqual(
+            'view',
+            registry.get_action_group_for_permission('View', 'foo'))
+
+        self.load_map_permissions_zcml(
+            '<lawgiver:ignore',
+            '    workflow="foo"'
+            '    permissions="View" />')
+
+        self.assertEqual(
+            None,
+            registry.get_action_group_for_permission('View', 'foo'))
+
+        self.assertEqual(set([u'View']),
+                         registry.get_ignored_permissions('foo'))
+
+    def test_modifying_query_results_does_not_change_index(self):
+        self.load_map_permissions_zcml(
+            '<lawgiver:map_permissions',
+            '    action_group="view"',
+            '    permissions="View" />')
+
+        registry = self.get_registry()
+        registry.get_action_groups_for_workflow('foo')['view'].add('Foo')
+        registry.get_ignored_permissions('foo').add('Bar')
+
+        self.assertEqual({'view': set([u'View'])},
+                         registry.get_action_groups_for_workflow('foo'))
+        self.assertEqual(set(), registry.get_ignored_permissions('foo'))
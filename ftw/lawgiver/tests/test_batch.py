@@ -0,0 +1,221 @@
+from ftw.lawgiver.interfaces import IActionGroupRegistry
+from ftw.lawgiver.interfaces import IBatchWorkflowGenerator
+from ftw.lawgiver.testing import ZCML_FIXTURE
+from ftw.lawgiver.tests.base import BaseTest
+from plone.i18n.normalizer.interfaces import INormalizer
+from zope.component import getUtility
+from zope.component import provideUtility
+from zope.component import queryUtility
+from zope.interface.verify import verifyObject
+import os
+import shutil
+import tempfile
+
+
+ASSETS = os.path.join(os.path.dirname(__file__), 'assets')
+
+
+class CountingNormalizer(object):
+
+    def __init__(self, normalizer):
+        self.normalizer = normalizer
+        self.normalized = {}
+
+    def normalize(self, text, *args, **kwargs):
+        self.normalized[text] = self.normalized.get(text, 0) + 1
+        return self.normalizer.normalize(text, *args, **kwargs)
+
+
+class TestBatchWorkflowGenerator(BaseTest):
+
+    layer = ZCML_FIXTURE
+
+    def setUp(self):
+        super(TestBatchWorkflowGenerator, self).setUp()
+
+        import plone.i18n.normalizer
+        provideUtility(plone.i18n.normalizer.idnormalizer,
+                       plone.i18n.normalizer.IIDNormalizer)
+
+        # use an empty permission mapping registry
+        registry = getUtility(IActionGroupRegistry)
+        self._ori_permissions = registry._permissions
+        registry._permissions = {}
+        registry._indexes.clear()
+
+        self.register_permissions(**{
+                'cmf.ModifyPortalContent': 'Modify portal content',
+                'zope2.View': 'View',
+                'zope2.AccessContentsInformation': \
+                    'Access contents information',
+                'zope2.DeleteObjects': 'Delete objects',
+                'cmf.AddPortalContent': 'Add portal content',
+                'cmf.AccessFuturePortalContent': \
+                    'Access future portal content',
+                'ATContentTypes: Add Image': 'ATContentTypes: Add Image',
+                })
+
+        self.map_permissions(['View', 'Access contents information'], 'view')
+        self.map_permissions(['Modify portal content'], 'edit')
+        self.map_permissions(['Delete objects'], 'delete')
+        self.map_permissions(['Add portal content',
+                              'ATContentTypes: Add Image'],
+                             'add')
+        self.map_permissions(['Access future portal content'], 'view future')
+        self.map_permissions(['ATContentTypes: Add Image'], 'edit',
+                             workflow_name='my_custom_workflow')
+
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        registry = getUtility(IActionGroupRegistry)
+        registry._permissions = self._ori_permissions
+        registry._indexes.clear()
+        super(TestBatchWorkflowGenerator, self).tearDown()
+
+    def create_specification(self, workflow_id, text):
+        directory = os.path.join(self.tempdir, 'workflows', workflow_id)
+        os.makedirs(directory)
+        path = os.path.join(directory, 'specification.txt')
+        with open(path, 'w+') as spec_file:
+            spec_file.write(text)
+        return path
+
+    def test_component_registered(self):
+        self.assertTrue(
+            queryUtility(IBatchWorkflowGenerator),
+            'The IBatchWorkflowGenerator utility is not registered.')
+
+    def test_component_implements_interface(self):
+        component = getUtility(IBatchWorkflowGenerator)
+        self.assertTrue(IBatchWorkflowGenerator.providedBy(component))
+
+        verifyObject(IBatchWorkflowGenerator, component)
+
+    def test_generates_all_specifications(self):
+        with open(os.path.join(ASSETS, 'example.specification.txt')) as file_:
+            example = file_.read()
+
+        paths = [self.create_specification('my_custom_workflow', example),
+                 self.create_specification('invalid', '[Foo]\nbar = baz')]
+
+        results = getUtility(IBatchWorkflowGenerator)(paths)
+
+        self.assertEquals(
+            [('invalid', 'The option "bar" is not valid.'),
+             ('my_custom_workflow', None)],
+            [(result['workflow_id'], result['error'])
+             for result in results])
+
+        for result in results:
+            self.assertGreaterEqual(result['duration'], 0)
+
+        invalid, custom = results
+        self.assertFalse(os.path.exists(invalid['definition_path']),
+                         'No definition.xml should be written on errors.')
+
+        with open(os.path.join(ASSETS, 'example.definition.xml')) as file_:
+            expected = file_.read()
+
+        with open(custom['definition_path']) as file_:
+            self.assert_definition_xmls(expected, file_.read())
+
+    def test_generates_in_worker_processes(self):
+        with open(os.path.join(ASSETS, 'example.specification.txt')) as file_:
+            example = file_.read()
+
+        paths = [self.create_specification('my_custom_workflow', example),
+                 self.create_specification('other_workflow', example)]
+
+        serial = getUtility(IBatchWorkflowGenerator)(paths)
+        expected = []
+        for result in serial:
+            with open(result['definition_path']) as file_:
+                expected.append(file_.read())
+
+        for result in serial:
+            os.remove(result['definition_path'])
+
+        parallel = getUtility(IBatchWorkflowGenerator)(paths, processes=2,
+                                                       force=True)
+        self.assertEquals([(None, False), (None, False)],
+                          [(result['error'], result['up_to_date'])
+                           for result in parallel])
+
+        for xml, result in zip(expected, parallel):
+            with open(result['definition_path']) as file_:
+                self.assertEquals(xml, file_.read())
+
+    def test_titles_are_normalized_once_over_all_workflows(self):
+        with open(os.path.join(ASSETS, 'example.specification.txt')) as file_:
+            example = file_.read()
+
+        paths = [self.create_specification('my_custom_workflow', example),
+                 self.create_specification('other_workflow', example)]
+
+        original = getUtility(INormalizer)
+        self.addCleanup(provideUtility, original, INormalizer)
+        normalizer = CountingNormalizer(original)
+        provideUtility(normalizer, INormalizer)
+
+        results = getUtility(IBatchWorkflowGenerator)(paths)
+        self.assertEquals([None, None],
+                          [result['error'] for result in results])
+
+        self.assertIn(u'Private', normalizer.normalized)
+        self.assertEquals(set([1]), set(normalizer.normalized.values()))
+
+    def test_definition_is_not_touched_on_errors(self):
+        path = self.create_specification('invalid', '[Foo]\nbar = baz')
+        definition_path = os.path.join(os.path.dirname(path),
+                                       'definition.xml')
+        with open(definition_path, 'w+') as file_:
+            file_.write('previous definition')
+
+        getUtility(IBatchWorkflowGenerator)([path])
+
+        with open(definition_path) as file_:
+            self.assertEquals('previous definition', file_.read())
+        self.assertEquals(['definition.xml', 'specification.txt'],
+                          sorted(os.listdir(os.path.dirname(path))))
+
+    def test_skips_unchanged_workflows(self):
+        with open(os.path.join(ASSETS, 'example.specification.txt')) as file_:
+            example = file_.read()
+
+        paths = [self.create_specification('my_custom_workflow', example)]
+        batch = getUtility(IBatchWorkflowGenerator)
+
+        self.assertEquals([False], [result['up_to_date']
+                                    for result in batch(paths)])
+        self.assertEquals([True], [result['up_to_date']
+                                   for result in batch(paths)])
+        self.assertEquals([False], [result['up_to_date']
+                                    for result in batch(paths, force=True)])
+
+        self.map_permissions(['Delete objects'], 'edit',
+                             workflow_name='my_custom_workflow')
+        self.assertEquals(
+            [False], [result['up_to_date'] for result in batch(paths)],
+            'Changing the action groups should regenerate the workflow.')
+
+        with open(paths[0], 'a') as file_:
+            file_.write('\n')
+        self.assertEquals(
+            [False], [result['up_to_date'] for result in batch(paths)],
+            'Changing the specification should regenerate the workflow.')
+
+    def test_regenerates_when_definition_is_missing(self):
+        with open(os.path.join(ASSETS, 'example.specification.txt')) as file_:
+            example = file_.read()
+
+        paths = [self.create_specification('my_custom_workflow', example)]
+        batch = getUtility(IBatchWorkflowGenerator)
+
+        definition_path = batch(paths)[0]['definition_path']
+        os.remove(definition_path)
+
+        self.assertEquals([False], [result['up_to_date']
+                                    for result in batch(paths)])
+        self.assertTrue(os.path.exists(definition_path))
@@ -1,3 +1,4 @@
+from ftw.lawgiver.discovery import HASH_INDEX
 from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
 from ftw.lawgiver.testing import LAWGIVER_INTEGRATION_TESTING
 from plone.app.testing import PloneSandboxLayer
@@ -100,3 +101,39 @@ class TestWorkflowSpecificationDiscovery(TestCase):
             None, component.unhash(hash_),
             'The unhashing method should not accept hashed paths which'
             ' are not registered as specification file.')
+
+    def test_unhash_uses_index_of_last_discovery(self):
+        component = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                    IWorkflowSpecificationDiscovery)
+
+        path = component.discover()[0]
+        hash_ = component.hash(path)
+
+        def discover():
+            self.fail('unhash should not crawl the file system when'
+                      ' the hash is in the index.')
+        component.discover = discover
+
+        self.assertEquals(path, component.unhash(hash_))
+
+    def test_unhash_rediscovers_unknown_hashes(self):
+        component = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                    IWorkflowSpecificationDiscovery)
+
+        path = component.discover()[0]
+        HASH_INDEX.update(None, {})
+
+        self.assertEquals(path, component.unhash(component.hash(path)))
+
+    def test_unhash_rediscovers_when_index_key_changes(self):
+        component = getMultiAdapter((self.portal, self.portal.REQUEST),
+                                    IWorkflowSpecificationDiscovery)
+
+        path = component.discover()[0]
+        HASH_INDEX.update(None, {})
+
+        # Simulate a workflows directory changing during the discovery.
+        keys = iter(range(10))
+        component._get_index_key = lambda profile_paths: next(keys)
+
+        self.assertEquals(path, component.unhash(component.hash(path)))
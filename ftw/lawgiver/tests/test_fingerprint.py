@@ -0,0 +1,27 @@
+from ftw.lawgiver import fingerprint
+from unittest2 import TestCase
+import pkg_resources
+
+
+class TestLawgiverVersion(TestCase):
+
+    def setUp(self):
+        self._ori_version = fingerprint._LAWGIVER_VERSION[:]
+        self._ori_get_distribution = pkg_resources.get_distribution
+        del fingerprint._LAWGIVER_VERSION[:]
+
+    def tearDown(self):
+        pkg_resources.get_distribution = self._ori_get_distribution
+        fingerprint._LAWGIVER_VERSION[:] = self._ori_version
+
+    def test_version_of_the_distribution(self):
+        self.assertEquals(
+            pkg_resources.get_distribution('ftw.lawgiver').version,
+            fingerprint.get_lawgiver_version())
+
+    def test_unknown_when_not_installed_as_distribution(self):
+        def get_distribution(name):
+            raise pkg_resources.DistributionNotFound(name)
+        pkg_resources.get_distribution = get_distribution
+
+        self.assertEquals('unknown', fingerprint.get_lawgiver_version())
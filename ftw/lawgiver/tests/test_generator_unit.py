@@ -1,5 +1,6 @@
 from StringIO import StringIO
 from ftw.lawgiver.collector import DefaultPermissionCollector
+from ftw.lawgiver.generator import RoleInheritanceGraph
 from ftw.lawgiver.generator import WorkflowGenerator
 from ftw.lawgiver.generator import resolve_inherited_roles
 from ftw.lawgiver.interfaces import IPermissionCollector
@@ -254,6 +255,36 @@ class TestGenerator(BaseTest):
 
         self.assert_xml(expected, result.getvalue())
 
+    def test_action_group_table_is_built_once_per_status(self):
+        self.register_permissions(**{
+                'cmf.ModifyPortalContent': 'Modify portal content',
+                'zope2.View': 'View',
+                'zope2.AccessContentsInformation': \
+                    'Access contents information'})
+
+        self.map_permissions(['View', 'Access contents information'], 'view')
+        self.map_permissions(['Modify portal content'], 'edit')
+
+        spec = Specification(title='Workflow',
+                             initial_status_title='Foo')
+        spec.role_mapping['writer'] = 'Editor'
+        spec.states['Foo'] = Status('Foo', [('writer', 'view'),
+                                            ('writer', 'edit')])
+        spec.states['Bar'] = Status('Bar', [('writer', 'view')])
+        spec.validate()
+
+        calls = []
+
+        class CountingGenerator(WorkflowGenerator):
+
+            def _get_roles_per_action_group(self, *args):
+                calls.append(args)
+                return super(CountingGenerator,
+                             self)._get_roles_per_action_group(*args)
+
+        CountingGenerator()('example-workflow', spec).write(StringIO())
+        self.assertEquals(2, len(calls))
+
     def test_workflow_guarded_transitions(self):
         spec = Specification(title='Workflow',
                              initial_status_title='Private')
@@ -560,6 +591,88 @@ class TestGenerator(BaseTest):
 
         self.assert_definition_xmls(expected, result.getvalue())
 
+    def test_get_permission_matrix(self):
+        self.register_permissions(**{
+                'cmf.ModifyPortalContent': 'Modify portal content',
+                'zope2.View': 'View'})
+
+        self.map_permissions(['View'], 'view')
+        self.map_permissions(['Modify portal content'], 'edit')
+
+        spec = Specification(title='Workflow',
+                             initial_status_title='Private',
+                             role_inheritance=[('chief', 'editor')])
+        spec.role_mapping['editor'] = 'Editor'
+        spec.role_mapping['chief'] = 'Reviewer'
+
+        spec.states['Private'] = private = Status(
+            'Private', [('editor', 'view'),
+                        ('editor', 'edit'),
+                        ('chief', 'publish')])
+        spec.states['Published'] = published = Status(
+            'Published', [('editor', 'view')])
+        spec.transitions.append(Transition('publish', private, published))
+        spec.validate()
+
+        self.assertEquals(
+            {'wf--STATUS--private': {'Editor': ['edit', 'view'],
+                                     'Reviewer': ['edit', 'view']},
+             'wf--STATUS--published': {'Editor': ['view'],
+                                       'Reviewer': ['view']}},
+            WorkflowGenerator().get_permission_matrix('wf', spec))
+
+    def test_streaming_writes_same_xml(self):
+        self.register_permissions(**{
+                'cmf.ModifyPortalContent': 'Modify portal content',
+                'zope2.View': 'View'})
+        self.map_permissions(['View'], 'view')
+        self.map_permissions(['Modify portal content'], 'edit')
+
+        spec = Specification(title='Workflow',
+                             initial_status_title='Foo')
+        spec.role_mapping['editor'] = 'Editor'
+        spec.role_mapping['administrator'] = 'Site Administrator'
+        spec.role_inheritance.append(('administrator', 'editor'))
+
+        foo = spec.states['Foo'] = Status(
+            'Foo', [('editor', 'view'), ('editor', 'edit'),
+                    ('editor', 'publish')],
+            worklist_viewers=['editor'])
+        bar = spec.states['Bar'] = Status(
+            'Bar', [('editor', 'view'), ('administrator', 'retract')])
+
+        spec.transitions.append(Transition('publish', foo, bar))
+        spec.transitions.append(Transition('retract', bar, foo))
+        spec.validate()
+
+        generated = StringIO()
+        WorkflowGenerator()('example-workflow', spec).write(generated)
+
+        streamed = StringIO()
+        WorkflowGenerator().stream('example-workflow', spec, streamed)
+
+        self.maxDiff = None
+        self.assertMultiLineEqual(generated.getvalue(), streamed.getvalue())
+
+    def test_variables_are_added_to_each_workflow(self):
+        spec = Specification(title='Workflow',
+                             initial_status_title='Foo')
+        spec.states['Foo'] = Status('Foo', [])
+        spec.validate()
+
+        generator = WorkflowGenerator()
+        first = generator('first', spec).document
+        second = generator('second', spec).document
+
+        variable_ids = ['action', 'actor', 'comments', 'review_history',
+                        'time']
+        self.assertEquals(
+            variable_ids,
+            [node.get('variable_id') for node in first.findall('variable')])
+        self.assertEquals(
+            variable_ids,
+            [node.get('variable_id') for node in second.findall('variable')])
+
 
 class TestResolveInheritedRoles(TestCase):
 
@@ -605,3 +718,33 @@ class TestResolveInheritedRoles(TestCase):
         self.assertEquals(
             expected,
             set(resolve_inherited_roles(roles, role_inheritance)))
+
+
+class TestRoleInheritanceGraph(TestCase):
+
+    def test_inheritors_are_resolved_transitively(self):
+        graph = RoleInheritanceGraph([('Bar', 'Foo'),
+                                      ('Baz', 'Bar')])
+
+        self.assertEquals(set(['Bar', 'Baz']), graph.get_inheritors('Foo'))
+        self.assertEquals(set(['Baz']), graph.get_inheritors('Bar'))
+        self.assertEquals(set(), graph.get_inheritors('Baz'))
+
+    def test_resolve_returns_sorted_roles(self):
+        graph = RoleInheritanceGraph([('Bar', 'Foo'),
+                                      ('Baz', 'Bar')])
+
+        self.assertEquals(['Bar', 'Baz', 'Foo', 'Qux'],
+                          graph.resolve(['Qux', 'Foo']))
+
+    def test_cyclic_roles(self):
+        graph = RoleInheritanceGraph([('Foo', 'Bar'),
+                                      ('Bar', 'Foo'),
+                                      ('Baz', 'Foo')])
+
+        self.assertEquals(['Bar', 'Foo'], graph.get_cyclic_roles())
+        self.assertEquals(['Bar', 'Baz', 'Foo'], graph.resolve(['Bar']))
+
+    def test_no_cyclic_roles(self):
+        graph = RoleInheritanceGraph([('Bar', 'Foo')])
+        self.assertEquals([], graph.get_cyclic_roles())
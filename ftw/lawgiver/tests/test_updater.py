@@ -0,0 +1,430 @@
+from Products.CMFCore.interfaces import IWorkflowChain
+from Products.CMFCore.interfaces import IWorkflowTool
+from Products.CMFCore.utils import getToolByName
+from ZODB.POSException import ConflictError
+from ftw.lawgiver.interfaces import IWorkflowSecurityUpdater
+from ftw.lawgiver.testing import LAWGIVER_FUNCTIONAL_TESTING
+from ftw.lawgiver.testing import LAWGIVER_INTEGRATION_TESTING
+from ftw.lawgiver.updater import WorkflowSecurityUpdater
+from operator import itemgetter
+from operator import methodcaller
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import setRoles
+from threading import Condition
+from threading import Thread
+from unittest2 import TestCase
+from zope.component import getGlobalSiteManager
+from zope.component import getUtility
+from zope.component import provideAdapter
+from zope.component import queryUtility
+from zope.component.hooks import setSite
+from zope.interface import Interface
+from zope.interface import alsoProvides
+from zope.interface.verify import verifyObject
+import time
+import transaction
+
+
+class IOverriddenChain(Interface):
+    """Marks objects with an overridden workflow chain.
+    """
+
+
+def one_state_chain(obj, wftool):
+    return ('one_state_workflow', )
+
+
+class TestWorkflowSecurityUpdater(TestCase):
+
+    layer = LAWGIVER_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+
+        wftool = getToolByName(self.portal, 'portal_workflow')
+        wftool.setChainForPortalTypes(['Document'],
+                                      ('simple_publication_workflow', ))
+        wftool.setChainForPortalTypes(['Folder'], ('one_state_workflow', ))
+
+        self.portal.invokeFactory('Folder', 'folder')
+        self.folder = self.portal.get('folder')
+        self.folder.invokeFactory('Document', 'document')
+        self.document = self.folder.get('document')
+
+        for obj in (self.folder, self.document):
+            obj.manage_permission('View', roles=['Anonymous'], acquire=0)
+            obj.reindexObject()
+
+    def get_view_roles(self, obj):
+        return sorted(role['name'] for role in obj.rolesOfPermission('View')
+                      if role['selected'])
+
+    def test_component_registered(self):
+        self.assertTrue(
+            queryUtility(IWorkflowSecurityUpdater),
+            'The IWorkflowSecurityUpdater utility is not registered.')
+
+    def test_component_implements_interface(self):
+        component = getUtility(IWorkflowSecurityUpdater)
+        self.assertTrue(IWorkflowSecurityUpdater.providedBy(component))
+        verifyObject(IWorkflowSecurityUpdater, component)
+
+    def test_portal_types(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertIn('Document',
+                      updater.get_portal_types('simple_publication_workflow'))
+        self.assertNotIn('Folder',
+                         updater.get_portal_types('simple_publication_workflow'))
+
+    def test_updates_only_objects_with_the_workflow(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(1, updater.update('simple_publication_workflow'))
+
+        self.assertNotIn('Anonymous', self.get_view_roles(self.document))
+        self.assertEquals(['Anonymous'], self.get_view_roles(self.folder))
+
+    def test_skips_objects_with_overridden_chain(self):
+        provideAdapter(one_state_chain, (IOverriddenChain, IWorkflowTool),
+                       IWorkflowChain)
+        self.addCleanup(getGlobalSiteManager().unregisterAdapter,
+                        one_state_chain, (IOverriddenChain, IWorkflowTool),
+                        IWorkflowChain)
+        alsoProvides(self.document, IOverriddenChain)
+
+        wftool = getToolByName(self.portal, 'portal_workflow')
+        self.assertEquals(('one_state_workflow', ),
+                          tuple(wftool.getChainFor(self.document)))
+
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(0, updater.update('simple_publication_workflow'))
+        self.assertEquals(['Anonymous'], self.get_view_roles(self.document))
+
+    def test_updates_only_objects_in_states(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(0, updater.update('simple_publication_workflow',
+                                            states=['published']))
+        self.assertEquals(1, updater.update('simple_publication_workflow',
+                                            states=['private']))
+
+    def test_unknown_workflow(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(0, updater.update('unknown_workflow'))
+
+    def test_permission_map(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        permission_map = updater.get_permission_map(
+            'simple_publication_workflow')
+
+        self.assertIn('View', permission_map['permissions'])
+        self.assertIn('Anonymous',
+                      permission_map['states']['published']['View'][1])
+        self.assertNotIn('Anonymous',
+                         permission_map['states']['private']['View'][1])
+
+        self.assertEquals(None, updater.get_permission_map('unknown'))
+
+    def test_changed_states(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        old = {'permissions': ['View'],
+               'states': {'private': {'View': (True, ['Owner'])},
+                          'published': {'View': (True, ['Anonymous'])}}}
+        new = {'permissions': ['View'],
+               'states': {'private': {'View': (True, ['Editor', 'Owner'])},
+                          'published': {'View': (True, ['Anonymous'])},
+                          'pending': {'View': (True, ['Reviewer'])}}}
+
+        self.assertEquals(['pending', 'private'],
+                          updater.get_changed_states(old, new))
+        self.assertEquals([], updater.get_changed_states(new, new))
+
+    def test_all_states_changed_when_permissions_changed(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        old = {'permissions': ['View'],
+               'states': {'private': {'View': (True, ['Owner'])}}}
+        new = {'permissions': ['Modify portal content', 'View'],
+               'states': {'private': {'View': (True, ['Owner'])}}}
+
+        self.assertEquals(['private'], updater.get_changed_states(old, new))
+        self.assertEquals(['private'], updater.get_changed_states(None, new))
+
+
+class TestBatchedWorkflowSecurityUpdate(TestCase):
+
+    layer = LAWGIVER_FUNCTIONAL_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+
+        wftool = getToolByName(self.portal, 'portal_workflow')
+        wftool.setChainForPortalTypes(['Document'],
+                                      ('simple_publication_workflow', ))
+
+        self.documents = []
+        for index in range(5):
+            self.portal.invokeFactory('Document', 'document-%i' % index)
+            document = self.portal.get('document-%i' % index)
+            document.manage_permission('View', roles=['Anonymous'],
+                                       acquire=0)
+            self.documents.append(document)
+
+        transaction.commit()
+
+    def test_updates_in_chunks(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(5, updater.update_batched(
+                'simple_publication_workflow', batch_size=2))
+        self.assertEquals(None,
+                          updater.get_progress('simple_publication_workflow'))
+
+    def test_resume_interrupted_update(self):
+        class InterruptingUpdater(WorkflowSecurityUpdater):
+            calls = 0
+
+            def update_object(self, workflow, obj):
+                self.calls += 1
+                if self.calls > 2:
+                    raise KeyboardInterrupt()
+                return super(InterruptingUpdater, self).update_object(
+                    workflow, obj)
+
+        with self.assertRaises(KeyboardInterrupt):
+            InterruptingUpdater().update_batched(
+                'simple_publication_workflow', batch_size=2)
+        transaction.abort()
+
+        updater = getUtility(IWorkflowSecurityUpdater)
+        progress = updater.get_progress('simple_publication_workflow')
+        self.assertEquals((2, 2, 5), (progress['processed'],
+                                      progress['updated'],
+                                      progress['total']))
+
+        self.assertEquals(5, updater.resume('simple_publication_workflow',
+                                            batch_size=2))
+        self.assertEquals(None,
+                          updater.get_progress('simple_publication_workflow'))
+
+    def test_resume_without_progress(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(0, updater.resume('simple_publication_workflow'))
+
+
+class TestPartitionedWorkflowSecurityUpdate(TestCase):
+
+    layer = LAWGIVER_FUNCTIONAL_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+
+        wftool = getToolByName(self.portal, 'portal_workflow')
+        wftool.setChainForPortalTypes(['Document'],
+                                      ('simple_publication_workflow', ))
+
+        for index in range(5):
+            self.portal.invokeFactory('Document', 'document-%i' % index)
+            self.portal.get('document-%i' % index).manage_permission(
+                'View', roles=['Anonymous'], acquire=0)
+
+        transaction.commit()
+
+    def get_statuses(self, updater):
+        return [partition['status'] for partition in
+                updater.get_partitions('simple_publication_workflow')]
+
+    def test_creates_partitions_of_same_size(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        self.assertEquals(2, updater.create_partitions(
+                'simple_publication_workflow', partitions=2))
+
+        partitions = updater.get_partitions('simple_publication_workflow')
+        self.assertEquals([3, 2], [partition['total']
+                                   for partition in partitions])
+        self.assertEquals(partitions[0]['end'], partitions[1]['cursor'])
+
+    def test_partition_ends_are_found_in_chunks(self):
+        batch_sizes = []
+
+        class RecordingUpdater(WorkflowSecurityUpdater):
+
+            def _query_chunk(self, workflow_id, progress, batch_size):
+                batch_sizes.append(batch_size)
+                return super(RecordingUpdater, self)._query_chunk(
+                    workflow_id, progress, batch_size)
+
+        updater = RecordingUpdater()
+        self.assertEquals(3, updater.create_partitions(
+                'simple_publication_workflow', partitions=3, batch_size=2))
+        self.assertEquals([2, 2], batch_sizes)
+
+        partitions = updater.get_partitions('simple_publication_workflow')
+        self.assertEquals([2, 2, 1], [partition['total']
+                                      for partition in partitions])
+        self.assertEquals(
+            [None, partitions[0]['end'], partitions[1]['end']],
+            [partition['cursor'] for partition in partitions])
+        self.assertEquals(None, partitions[2]['end'])
+
+        self.assertEquals(5, updater.work_partitions(
+                'simple_publication_workflow', batch_size=2))
+
+    def test_workers_update_all_partitions(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=3)
+
+        self.assertEquals(5, updater.work_partitions(
+                'simple_publication_workflow', batch_size=1))
+        self.assertEquals(0, updater.work_partitions(
+                'simple_publication_workflow'))
+        self.assertEquals(['done', 'done', 'done'],
+                          self.get_statuses(updater))
+
+        self.assertEquals(5, updater.finish_partitions(
+                'simple_publication_workflow'))
+        self.assertEquals(None, updater.get_partitions(
+                'simple_publication_workflow'))
+
+    def test_not_finished_while_partitions_are_pending(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=2)
+
+        self.assertEquals(None, updater.finish_partitions(
+                'simple_publication_workflow'))
+        self.assertEquals(['pending', 'pending'], self.get_statuses(updater))
+
+    def test_conflicting_chunk_is_retried(self):
+        class ConflictingUpdater(WorkflowSecurityUpdater):
+            calls = 0
+
+            def update_object(self, workflow, obj):
+                self.calls += 1
+                if self.calls == 3:
+                    raise ConflictError()
+                return super(ConflictingUpdater, self).update_object(
+                    workflow, obj)
+
+        updater = ConflictingUpdater()
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=1)
+
+        self.assertEquals(5, updater.work_partitions(
+                'simple_publication_workflow', batch_size=2))
+        self.assertEquals(6, updater.calls)
+        self.assertEquals(['done'], self.get_statuses(updater))
+        self.assertEquals(5, updater.finish_partitions(
+                'simple_publication_workflow'))
+
+    def test_conflicts_are_raised_after_retrying(self):
+        class ConflictingUpdater(WorkflowSecurityUpdater):
+
+            def update_object(self, workflow, obj):
+                raise ConflictError()
+
+        updater = ConflictingUpdater()
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=1)
+
+        with self.assertRaises(ConflictError):
+            updater.work_partitions('simple_publication_workflow')
+        transaction.abort()
+        self.assertEquals(['running'], self.get_statuses(updater))
+
+    def test_release_partitions_of_crashed_workers(self):
+        class CrashingUpdater(WorkflowSecurityUpdater):
+
+            def update_object(self, workflow, obj):
+                raise KeyboardInterrupt()
+
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=2)
+
+        with self.assertRaises(KeyboardInterrupt):
+            CrashingUpdater().work_partitions('simple_publication_workflow')
+        transaction.abort()
+        self.assertEquals(['running', 'pending'], self.get_statuses(updater))
+
+        self.assertEquals(0, updater.release_partitions(
+                'simple_publication_workflow'),
+                          'Partitions with recent heartbeat are not released.')
+        self.assertEquals(1, updater.release_partitions(
+                'simple_publication_workflow', timeout=0))
+        self.assertEquals(5, updater.work_partitions(
+                'simple_publication_workflow'))
+        self.assertEquals(5, updater.finish_partitions(
+                'simple_publication_workflow'))
+
+    def test_concurrent_workers_claim_different_partitions(self):
+        updater = getUtility(IWorkflowSecurityUpdater)
+        updater.create_partitions('simple_publication_workflow',
+                                  partitions=2)
+
+        barrier = Barrier(2)
+        stored = []
+
+        class SynchronizedUpdater(WorkflowSecurityUpdater):
+            waited = False
+
+            def _store_partition(self, *args):
+                super(SynchronizedUpdater, self)._store_partition(*args)
+                stored.append(args[1])
+                # Both workers modify the first partition before any of
+                # them commits.
+                if not self.waited:
+                    self.waited = True
+                    barrier.wait()
+
+        db = self.layer['zodbDB']
+        site_id = self.portal.getId()
+        claimed = {}
+        errors = []
+
+        def worker(name):
+            connection = db.open()
+            try:
+                setSite(connection.root()['Application'][site_id])
+                claimed[name] = SynchronizedUpdater()._claim_partition(
+                    'simple_publication_workflow', name)
+            except Exception, exc:
+                errors.append(exc)
+            finally:
+                transaction.abort()
+                setSite(None)
+                connection.close()
+
+        threads = [Thread(target=worker, args=(name, ))
+                   for name in ('worker-1', 'worker-2')]
+        map(methodcaller('start'), threads)
+        map(methodcaller('join'), threads)
+
+        self.assertEquals([], errors)
+        self.assertEquals([0, 1], sorted(claimed.values()))
+        self.assertEquals(
+            [0, 0, 1], sorted(stored),
+            'The worker losing the conflict should claim the next partition.')
+
+        transaction.begin()
+        self.assertEquals(
+            [('running', name) for name, index in sorted(
+                    claimed.items(), key=itemgetter(1))],
+            [(partition['status'], partition['worker']) for partition in
+             updater.get_partitions('simple_publication_workflow')])
+
+
+class Barrier(object):
+
+    def __init__(self, parties, timeout=10):
+        self.parties = parties
+        self.timeout = timeout
+        self.condition = Condition()
+
+    def wait(self):
+        with self.condition:
+            self.parties -= 1
+            self.condition.notify_all()
+            timeout = time.time() + self.timeout
+            while self.parties > 0 and time.time() < timeout:
+                self.condition.wait(timeout - time.time())
@@ -0,0 +1,113 @@
+from ftw.lawgiver.fingerprint import FINGERPRINT_CACHE
+from ftw.lawgiver.fingerprint import get_fingerprint
+from ftw.lawgiver.interfaces import ILawgiverLayer
+from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
+from ftw.lawgiver.testing import SPECIFICATIONS_FUNCTIONAL
+from unittest2 import TestCase
+from zExceptions import NotFound
+from zope.component import getMultiAdapter
+from zope.interface import alsoProvides
+import json
+import os
+
+
+class TestSpecificationsJSON(TestCase):
+
+    layer = SPECIFICATIONS_FUNCTIONAL
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        alsoProvides(self.request, ILawgiverLayer)
+        FINGERPRINT_CACHE.clear()
+
+    def get_view(self, spec_hash=None):
+        view = getMultiAdapter((self.portal, self.request),
+                               name='lawgiver-specs-json')
+        if spec_hash:
+            view.publishTraverse(self.request, spec_hash)
+        return view
+
+    def get_hash(self, workflow_id):
+        discovery = getMultiAdapter((self.portal, self.request),
+                                    IWorkflowSpecificationDiscovery)
+        return discovery.hash(self.get_path(workflow_id))
+
+    def get_path(self, workflow_id):
+        discovery = getMultiAdapter((self.portal, self.request),
+                                    IWorkflowSpecificationDiscovery)
+        for path in discovery.discover():
+            if path.endswith('/%s/specification.txt' % workflow_id):
+                return path
+        raise KeyError(workflow_id)
+
+    def test_lists_specifications(self):
+        data = json.loads(self.get_view()())
+
+        self.assertEquals(
+            [('another-spec-based-workflow', 'error'),
+             ('invalid-spec', 'ok'),
+             ('my_custom_workflow', 'ok'),
+             ('spec-based-workflow', 'error'),
+             ('wf-bar', 'ok'),
+             ('wf-foo', 'ok')],
+            sorted((item['workflow_id'], item['status']) for item in data))
+
+        bar = [item for item in data if item['workflow_id'] == 'wf-bar'][0]
+        self.assertEquals('Bar Workflow', bar['title'])
+        self.assertEquals(40, len(bar['fingerprint']))
+        self.assertNotIn('matrix', bar)
+
+    def test_specification_details_contain_matrix(self):
+        data = json.loads(self.get_view(self.get_hash('wf-bar'))())
+
+        self.assertEquals('wf-bar', data['workflow_id'])
+        self.assertEquals(
+            {'wf-bar--STATUS--published': {'Editor': ['add', 'edit', 'view']}},
+            data['matrix'])
+
+    def test_matrix_is_none_when_generating_fails(self):
+        data = json.loads(self.get_view(self.get_hash('invalid-spec'))())
+
+        self.assertEquals('ok', data['status'])
+        self.assertEquals(None, data['matrix'])
+        self.assertEquals(
+            'Action "viewX" is neither action group nor transition.',
+            data['matrix_error'])
+
+    def test_unknown_hash(self):
+        with self.assertRaises(NotFound):
+            self.get_view('foo')()
+
+    def test_not_modified_when_etag_matches(self):
+        self.get_view()()
+        etag = self.request.response.getHeader('ETag')
+        self.assertTrue(etag)
+        self.assertTrue(self.request.response.getHeader('Last-Modified'))
+
+        self.request.environ['HTTP_IF_NONE_MATCH'] = etag
+        self.assertEquals('', self.get_view()())
+        self.assertEquals(304, self.request.response.getStatus())
+
+    def test_fingerprints_are_cached_between_requests(self):
+        self.get_view()()
+        self.assertEquals((0, 6), (FINGERPRINT_CACHE.hits,
+                                   FINGERPRINT_CACHE.misses))
+
+        self.get_view()()
+        self.assertEquals((6, 6), (FINGERPRINT_CACHE.hits,
+                                   FINGERPRINT_CACHE.misses))
+
+    def test_changed_specification_is_fingerprinted_again(self):
+        path = self.get_path('wf-bar')
+        data = json.loads(self.get_view(self.get_hash('wf-bar'))())
+        self.assertEquals(get_fingerprint('wf-bar', path),
+                          data['fingerprint'])
+
+        stat = os.stat(path)
+        self.addCleanup(os.utime, path, (stat.st_atime, stat.st_mtime))
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+        self.get_view(self.get_hash('wf-bar'))()
+        self.assertEquals((0, 2), (FINGERPRINT_CACHE.hits,
+                                   FINGERPRINT_CACHE.misses))
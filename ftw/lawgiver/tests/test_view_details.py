@@ -1,4 +1,6 @@
 from Products.CMFCore.utils import getToolByName
+from ftw.lawgiver.fingerprint import get_fingerprint_path
+from ftw.lawgiver.interfaces import IWorkflowSpecificationDiscovery
 from ftw.lawgiver.testing import SPECIFICATIONS_FUNCTIONAL
 from ftw.lawgiver.tests.pages import SpecDetails
 from ftw.lawgiver.tests.pages import SpecDetailsConfirmation
@@ -9,6 +11,7 @@ from plone.app.testing import SITE_OWNER_NAME
 from plone.app.testing import SITE_OWNER_PASSWORD
 from plone.app.testing import applyProfile
 from unittest2 import TestCase
+from zope.component import getMultiAdapter
 import os
 import shutil
 import transaction
@@ -24,8 +27,9 @@ INVALID_WORKFLOW_DEFINITION_XML = os.path.abspath(os.path.join(
 
 
 def remove_definition_xml(path=BAR_DEFINITION_XML):
-    if os.path.exists(path):
-        os.remove(path)
+    for filepath in (path, get_fingerprint_path(path)):
+        if os.path.exists(filepath):
+            os.remove(filepath)
 
 
 class TestBARSpecificationDetailsViewINSTALLED(TestCase):
@@ -173,12 +177,22 @@ class TestBARSpecificationDetailsViewINSTALLED(TestCase):
 
         Plone().assert_portal_message(
             'info', 'Workflow wf-bar successfully imported.')
+        Plone().assert_portal_message(
+            'info', 'Security update: 0 objects updated.')
 
     def test_update_security(self):
         SpecDetails().button_reindex().click()
         Plone().assert_portal_message(
             'info', 'Security update: 0 objects updated.')
 
+    def test_update_workflow_security(self):
+        SpecDetails().button_update_workflow_security().click()
+        Plone().assert_portal_message(
+            'info', 'Security update: 0 objects updated.')
+
+    def test_no_resume_button_without_unfinished_update(self):
+        self.assertFalse(SpecDetails().button_resume_workflow_security())
+
 
 class TestBARSpecificationDetailsViewNOT_INSTALLED(TestCase):
     """Tests the specification details view of the workflow "wf-bar"
@@ -351,7 +365,8 @@ class TestDestructiveImport(TestCase):
     def tearDown(self):
         paths = [
             os.path.join(DESTRUCTIVE_WF_DIR, 'specification.txt'),
-            os.path.join(DESTRUCTIVE_WF_DIR, 'definition.xml'),]
+            os.path.join(DESTRUCTIVE_WF_DIR, 'definition.xml'),
+            os.path.join(DESTRUCTIVE_WF_DIR, 'definition.fingerprint')]
 
         for path in paths:
             if os.path.exists(path):
@@ -414,3 +429,56 @@ class TestDestructiveImport(TestCase):
         Plone().assert_portal_message(
             'info', 'Workflow destructive-workflow successfully imported.')
         self.assert_current_states('Foo', 'Bar')
+
+
+class TestSpecificationDetailsViewPathResolving(TestCase):
+
+    layer = SPECIFICATIONS_FUNCTIONAL
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        discovery = getMultiAdapter((self.portal, self.request),
+                                    IWorkflowSpecificationDiscovery)
+        self.paths = sorted(discovery.discover())
+        self.hashes = map(discovery.hash, self.paths)
+
+        self.view = getMultiAdapter((self.portal, self.request),
+                                    name='lawgiver-spec-details')
+        self.resolved = []
+
+        resolve = self.view._resolve_spec_path
+        lookup = self.view._lookup_profile_name_for_workflow
+
+        def resolve_spec_path():
+            self.resolved.append('path')
+            return resolve()
+
+        def lookup_profile_name():
+            self.resolved.append('profile')
+            return lookup()
+
+        self.view._resolve_spec_path = resolve_spec_path
+        self.view._lookup_profile_name_for_workflow = lookup_profile_name
+
+    def test_path_is_resolved_once_per_view(self):
+        self.view.publishTraverse(self.request, self.hashes[0])
+
+        self.assertEquals(self.paths[0], self.view.get_spec_path())
+        self.view.workflow_name()
+        self.view.get_definition_path()
+        self.view._find_profile_name_for_workflow()
+        self.view._find_profile_name_for_workflow()
+
+        self.assertEquals(['path', 'profile'], self.resolved)
+
+    def test_traversing_resets_the_resolved_path(self):
+        self.view.publishTraverse(self.request, self.hashes[0])
+        self.view._find_profile_name_for_workflow()
+
+        self.view.publishTraverse(self.request, self.hashes[1])
+        self.assertEquals(self.paths[1], self.view.get_spec_path())
+        self.view._find_profile_name_for_workflow()
+
+        self.assertEquals(['path', 'profile', 'path', 'profile'],
+                          self.resolved)
@@ -5,6 +5,7 @@ from operator import methodcaller
 from plone.app.testing import SITE_OWNER_NAME
 from plone.app.testing import SITE_OWNER_PASSWORD
 from unittest2 import TestCase
+from zope.component import getMultiAdapter
 
 
 class TestSpecificationListingsView(TestCase):
@@ -17,12 +18,12 @@ class TestSpecificationListingsView(TestCase):
 
         specs = SpecsListing().get_specifications()
         self.assertEquals(
-            ['Bar Workflow (wf-bar)',
-             'Foo Workflow (wf-foo)',
+            ['another-spec-based-workflow',
              'Invalid Workflow (invalid-spec)',
              'My Custom Workflow (my_custom_workflow)',
-             'another-spec-based-workflow',
-             'spec-based-workflow'],
+             'spec-based-workflow',
+             'Bar Workflow (wf-bar)',
+             'Foo Workflow (wf-foo)'],
 
             map(methodcaller('link_text'), specs),
 
@@ -56,3 +57,66 @@ class TestSpecificationListingsView(TestCase):
         self.assertEquals(
             sorted(links), sorted(set(links)),
             'There are ambiguous spec links. Is the hashing wrong?')
+
+    def test_filter_specifications(self):
+        Plone().login(SITE_OWNER_NAME, SITE_OWNER_PASSWORD)
+        SpecsListing().open('filter=publi')
+
+        specs = SpecsListing().get_specifications()
+        self.assertEquals(
+            ['My Custom Workflow (my_custom_workflow)',
+             'Bar Workflow (wf-bar)'],
+            map(methodcaller('link_text'), specs),
+            'Filtering should match titles and descriptions.')
+
+    def test_batching_specifications(self):
+        Plone().login(SITE_OWNER_NAME, SITE_OWNER_PASSWORD)
+        SpecsListing().open('b_size=2&b_start=2')
+
+        specs = SpecsListing().get_specifications()
+        self.assertEquals(
+            ['My Custom Workflow (my_custom_workflow)',
+             'spec-based-workflow'],
+            map(methodcaller('link_text'), specs))
+
+    def test_invalid_batching_parameters_fall_back_to_defaults(self):
+        Plone().login(SITE_OWNER_NAME, SITE_OWNER_PASSWORD)
+        SpecsListing().open('b_size=foo&b_start=-1')
+
+        specs = SpecsListing().get_specifications()
+        self.assertEquals(6, len(specs))
+
+
+class TestSpecificationListingsBatching(TestCase):
+
+    layer = SPECIFICATIONS_FUNCTIONAL
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        self.view = getMultiAdapter((self.portal, self.request),
+                                    name='lawgiver-list-specs')
+
+        self.read_headers = []
+        ori_get_header = self.view._get_specification_header_by_path
+
+        def get_header(path):
+            self.read_headers.append(path)
+            return ori_get_header(path)
+        self.view._get_specification_header_by_path = get_header
+
+    def test_reads_headers_only_for_the_current_page(self):
+        self.request.form.update({'b_size': '2', 'b_start': '2'})
+        self.assertEquals(
+            ['My Custom Workflow (my_custom_workflow)',
+             'spec-based-workflow'],
+            [spec['link_text'] for spec in self.view.batch()])
+        self.assertEquals(2, len(self.read_headers))
+
+    def test_filtering_reads_all_headers(self):
+        self.request.form.update({'filter': 'publi'})
+        self.assertEquals(
+            ['My Custom Workflow (my_custom_workflow)',
+             'Bar Workflow (wf-bar)'],
+            [spec['link_text'] for spec in self.view.batch()])
+        self.assertEquals(6, len(self.read_headers))
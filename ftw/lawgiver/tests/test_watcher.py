@@ -0,0 +1,141 @@
+from ftw.lawgiver.watcher import SpecificationFileWatcher
+from ftw.lawgiver.watcher import pyinotify
+from unittest2 import TestCase
+from unittest2 import skipIf
+import os
+import shutil
+import tempfile
+import time
+
+
+class TestSpecificationFileWatcher(TestCase):
+
+    def setUp(self):
+        self.profile = tempfile.mkdtemp()
+        self.scanned = []
+
+    def tearDown(self):
+        shutil.rmtree(self.profile)
+
+    def scanner(self, profile_directory):
+        self.scanned.append(profile_directory)
+        workflows = os.path.join(profile_directory, 'workflows')
+        if not os.path.isdir(workflows):
+            return []
+
+        return sorted(
+            os.path.join(workflows, name, 'specification.txt')
+            for name in os.listdir(workflows)
+            if os.path.isfile(os.path.join(workflows, name,
+                                           'specification.txt')))
+
+    def create_specification(self, workflow_id):
+        directory = os.path.join(self.profile, 'workflows', workflow_id)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        path = os.path.join(directory, 'specification.txt')
+        open(path, 'w+').close()
+
+        # Make sure the modification time changes on file systems with a
+        # low time resolution.
+        future = time.time() + len(self.scanned) + 10
+        os.utime(directory, (future, future))
+        os.utime(os.path.dirname(directory), (future, future))
+        return path
+
+    def wait_for(self, condition):
+        timeout = time.time() + 5
+        while not condition() and time.time() < timeout:
+            time.sleep(0.01)
+
+    def test_polling_caches_files_until_directories_change(self):
+        watcher = SpecificationFileWatcher(use_inotify=False)
+        foo = self.create_specification('foo')
+
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile,
+                                                     self.scanner))
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile,
+                                                     self.scanner))
+        self.assertEquals(1, len(self.scanned))
+
+        bar = self.create_specification('bar')
+        self.assertEquals(
+            (bar, foo), watcher.get_specification_files(self.profile,
+                                                        self.scanner))
+        self.assertEquals(2, len(self.scanned))
+
+    def test_polling_detects_specification_in_existing_directory(self):
+        watcher = SpecificationFileWatcher(use_inotify=False)
+        foo = self.create_specification('foo')
+        watcher.get_specification_files(self.profile, self.scanner)
+
+        os.remove(foo)
+        future = time.time() + 100
+        os.utime(os.path.dirname(foo), (future, future))
+
+        self.assertEquals(
+            (), watcher.get_specification_files(self.profile, self.scanner))
+
+    def test_polling_detects_specification_in_new_directory(self):
+        watcher = SpecificationFileWatcher(use_inotify=False)
+        foo = self.create_specification('foo')
+        watcher.get_specification_files(self.profile, self.scanner)
+
+        directory = os.path.join(self.profile, 'workflows', 'bar')
+        os.mkdir(directory)
+        future = time.time() + 100
+        os.utime(os.path.dirname(directory), (future, future))
+        os.utime(directory, (future, future))
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile,
+                                                     self.scanner))
+
+        bar = os.path.join(directory, 'specification.txt')
+        open(bar, 'w+').close()
+        future += 100
+        os.utime(directory, (future, future))
+        self.assertEquals(
+            (bar, foo), watcher.get_specification_files(self.profile,
+                                                        self.scanner))
+
+    def test_polling_detects_specification_created_while_scanning(self):
+        watcher = SpecificationFileWatcher(use_inotify=False)
+        foo = self.create_specification('foo')
+        created = []
+
+        def scanner(profile_directory):
+            files = self.scanner(profile_directory)
+            if not created:
+                created.append(self.create_specification('bar'))
+            return files
+
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile, scanner))
+        self.assertEquals(
+            (created[0], foo), watcher.get_specification_files(self.profile,
+                                                               scanner))
+
+    @skipIf(pyinotify is None, 'pyinotify is not installed')
+    def test_inotify_rescans_after_events(self):
+        watcher = SpecificationFileWatcher()
+        self.addCleanup(watcher.stop)
+
+        foo = self.create_specification('foo')
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile,
+                                                     self.scanner))
+        self.assertEquals(
+            (foo, ), watcher.get_specification_files(self.profile,
+                                                     self.scanner))
+        self.assertEquals(1, len(self.scanned))
+
+        bar = self.create_specification('bar')
+        self.wait_for(lambda: watcher.get_specification_files(
+                self.profile, self.scanner) == (bar, foo))
+
+        self.assertEquals(
+            (bar, foo), watcher.get_specification_files(self.profile,
+                                                        self.scanner))
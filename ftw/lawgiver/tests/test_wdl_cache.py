@@ -0,0 +1,73 @@
+from ftw.lawgiver.exceptions import ParsingError
+from ftw.lawgiver.testing import ZCML_FIXTURE
+from ftw.lawgiver.wdl.cache import SpecificationCache
+from unittest2 import TestCase
+import os
+import shutil
+import tempfile
+import time
+
+
+EXAMPLE = os.path.join(os.path.dirname(__file__),
+                       'assets', 'example.specification.txt')
+
+
+class TestSpecificationCache(TestCase):
+
+    layer = ZCML_FIXTURE
+
+    def setUp(self):
+        super(TestSpecificationCache, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'specification.txt')
+        shutil.copyfile(EXAMPLE, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        super(TestSpecificationCache, self).tearDown()
+
+    def touch(self, text=None):
+        if text is not None:
+            with open(self.path, 'w+') as file_:
+                file_.write(text)
+
+        future = time.time() + 10
+        os.utime(self.path, (future, future))
+
+    def test_reuses_parsed_specification(self):
+        cache = SpecificationCache()
+        spec = cache.get(self.path)
+        self.assertEquals('My Custom Workflow', spec.title)
+
+        self.assertIs(spec, cache.get(self.path))
+        self.assertEquals((1, 1), (cache.hits, cache.misses))
+
+    def test_parses_again_when_file_changed(self):
+        cache = SpecificationCache()
+        spec = cache.get(self.path)
+
+        self.touch()
+        self.assertIsNot(spec, cache.get(self.path))
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+
+    def test_errors_are_not_cached(self):
+        cache = SpecificationCache()
+        self.touch('[Foo]\nbar = baz')
+
+        with self.assertRaises(ParsingError):
+            cache.get(self.path)
+
+        self.assertEquals(None, cache.get(self.path, silent=True))
+        self.assertEquals((0, 2), (cache.hits, cache.misses))
+
+    def test_least_recently_used_entries_are_dropped(self):
+        cache = SpecificationCache(maxsize=1)
+        other = os.path.join(self.tempdir, 'other.txt')
+        shutil.copyfile(EXAMPLE, other)
+
+        cache.get(self.path)
+        cache.get(other)
+        cache.get(other)
+        cache.get(self.path)
+
+        self.assertEquals((1, 3), (cache.hits, cache.misses))
@@ -4,9 +4,12 @@ from ftw.lawgiver.testing import ZCML_FIXTURE
 from ftw.lawgiver.wdl.interfaces import ISpecification
 from ftw.lawgiver.wdl.interfaces import IWorkflowSpecificationParser
 from ftw.lawgiver.wdl.parser import PERMISSION_STATEMENT
+from ftw.lawgiver.wdl.parser import SpecificationParser
 from ftw.lawgiver.wdl.parser import WORKLIST_STATEMENT
 from ftw.lawgiver.wdl.parser import convert_statement
+from ftw.lawgiver.wdl.parser import read_specification_header
 from ftw.testing import MockTestCase
+from unittest2 import TestCase
 from zope.component import getUtility
 from zope.component import queryUtility
 from zope.interface.verify import verifyObject
@@ -201,6 +204,7 @@ class TestParser(MockTestCase):
         self.assertEquals(
             'Transition line has an invalid format: "this is invalid"',
             str(cm.exception))
+        self.assertEquals((4, 3), (cm.exception.line, cm.exception.column))
 
         self.assertEquals(
             None, self.parse_lines(*lines, silent=True),
@@ -218,6 +222,19 @@ class TestParser(MockTestCase):
                            'admin': 'Site Administrator'},
                           spec.role_mapping)
 
+    def test_literal_option_names_are_case_insensitive(self):
+        spec = self.parse_lines(
+            '[Foo]',
+            'ROLE MAPPING:',
+            '  admin => Site Administrator')
+
+        self.assertEquals({'admin': 'Site Administrator'},
+                          spec.role_mapping)
+
+    def test_consumers_are_collected_once_per_class(self):
+        self.assertIs(SpecificationParser._get_consumers(),
+                      SpecificationParser._get_consumers())
+
     def test_invalid_role_mapping_line(self):
         lines = (
             '[Foo]',
@@ -230,6 +247,7 @@ class TestParser(MockTestCase):
         self.assertEquals(
             'Invalid format in role mapping: "this is wrong"',
             str(cm.exception))
+        self.assertEquals((3, 3), (cm.exception.line, cm.exception.column))
 
         self.assertEquals(
             None, self.parse_lines(*lines, silent=True),
@@ -255,11 +273,42 @@ class TestParser(MockTestCase):
 
         self.assertEquals('The option "bar" is not valid.',
                           str(cm.exception))
+        self.assertEquals((2, 1), (cm.exception.line, cm.exception.column))
 
         self.assertEquals(
             None, self.parse_lines(*lines, silent=True),
             'Parser should not raise an exception when silent=True')
 
+    def test_invalid_statement_reports_line(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.parse_lines(
+                '[Foo]',
+                'Status Private:',
+                '  An editor can view this content.',
+                '',
+                '  gibberish here')
+
+        self.assertEquals('Unkown statement format: "gibberish here"',
+                          str(cm.exception))
+        self.assertEquals((5, 3), (cm.exception.line, cm.exception.column))
+
+    def test_invalid_value_on_option_line_reports_column(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.parse_lines(
+                '[Foo]',
+                'Role Mapping: this is wrong')
+
+        self.assertEquals((2, 15), (cm.exception.line, cm.exception.column))
+
+    def test_invalid_statement_reports_column_of_statement(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.parse_lines(
+                '[Foo]',
+                'Status Private:',
+                '      gibberish here')
+
+        self.assertEquals((3, 7), (cm.exception.line, cm.exception.column))
+
     def test_general_role_inheritance(self):
         spec = self.parse_lines(
             '[Foo]',
@@ -347,6 +396,11 @@ class TestConvertStatement(MockTestCase):
             (PERMISSION_STATEMENT, ('editor in chief', 'manage portlets')),
             'A editor in chief can manage portlets on this context.')
 
+    def test_statement_keywords_are_case_insensitive(self):
+        self.assert_statement(
+            (PERMISSION_STATEMENT, ('editor', 'view')),
+            'An Editor Can view This Content.')
+
     def test_always_statements(self):
         self.assert_statement(
             (PERMISSION_STATEMENT, ('administrator', 'view')),
@@ -382,3 +436,49 @@ class TestConvertStatement(MockTestCase):
         self.assert_statement(
             (WORKLIST_STATEMENT, 'editor in chief'),
             'An Editor in chief can access the worklist.')
+
+
+class TestReadSpecificationHeader(TestCase):
+
+    def read_lines(self, *lines):
+        return read_specification_header(StringIO('\n'.join(lines)))
+
+    def test_title_and_description(self):
+        self.assertEquals(
+            {'title': 'My Workflow',
+             'description': 'The description'},
+            self.read_lines(
+                '# A comment',
+                '[My Workflow]',
+                'Initial Status: Private',
+                'description: The description',
+                'Status Private:',
+                '  An editor can view this content.'))
+
+    def test_multiline_description(self):
+        self.assertEquals(
+            {'title': 'foo',
+             'description': 'first\nsecond'},
+            self.read_lines(
+                '[foo]',
+                'Description = first',
+                '  second',
+                'Initial Status: Private'))
+
+    def test_without_description(self):
+        self.assertEquals(
+            {'title': 'foo',
+             'description': None},
+            self.read_lines('[foo]', 'Initial Status: Private'))
+
+    def test_without_section(self):
+        self.assertEquals(None, self.read_lines(''))
+
+    def test_does_not_validate_the_specification(self):
+        self.assertEquals(
+            {'title': 'foo',
+             'description': 'bar'},
+            self.read_lines(
+                '[foo]',
+                'Description: bar',
+                'Not a valid option: baz'))
@@ -0,0 +1,127 @@
+from ftw.lawgiver.exceptions import ParsingError
+from ftw.lawgiver.fingerprint import get_lawgiver_version
+from ftw.lawgiver.wdl.parser import SpecificationParser
+from ftw.lawgiver.wdl.precompiled import get_precompiled_header
+from ftw.lawgiver.wdl.precompiled import get_precompiled_path
+from ftw.lawgiver.wdl.precompiled import get_source_hash
+from ftw.lawgiver.wdl.precompiled import load_specification
+from unittest2 import TestCase
+import marshal
+import os
+import shutil
+import tempfile
+
+
+EXAMPLE = os.path.join(os.path.dirname(__file__),
+                       'assets', 'example.specification.txt')
+
+
+class CountingParser(SpecificationParser):
+
+    def __init__(self):
+        super(CountingParser, self).__init__()
+        self.parsed = 0
+
+    def _parse(self, stream):
+        self.parsed += 1
+        return super(CountingParser, self)._parse(stream)
+
+
+class TestPrecompiledSpecification(TestCase):
+
+    def setUp(self):
+        super(TestPrecompiledSpecification, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'specification.txt')
+        shutil.copyfile(EXAMPLE, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        super(TestPrecompiledSpecification, self).tearDown()
+
+    def test_loads_precompiled_specification_without_parsing(self):
+        parser = CountingParser()
+        parsed = load_specification(self.path, parser)
+        self.assertTrue(os.path.exists(get_precompiled_path(self.path)))
+
+        loaded = load_specification(self.path, parser)
+        self.assertEquals(1, parser.parsed)
+
+        self.assertEquals(parsed.title, loaded.title)
+        self.assertEquals(parsed.role_mapping, loaded.role_mapping)
+        self.assertEquals(parsed.get_initial_status().title,
+                          loaded.get_initial_status().title)
+        self.assertEquals(
+            sorted((title, status.statements, status.role_inheritance,
+                    status.worklist_viewers)
+                   for title, status in parsed.states.items()),
+            sorted((title, status.statements, status.role_inheritance,
+                    status.worklist_viewers)
+                   for title, status in loaded.states.items()))
+        self.assertEquals(
+            [(transition.title, transition.src_status.title,
+              transition.dest_status.title)
+             for transition in parsed.transitions],
+            [(transition.title, transition.src_status.title,
+              transition.dest_status.title)
+             for transition in loaded.transitions])
+
+    def test_parses_again_when_the_source_changed(self):
+        parser = CountingParser()
+        load_specification(self.path, parser)
+
+        with open(self.path, 'a') as specfile:
+            specfile.write('\n# changed\n')
+
+        load_specification(self.path, parser)
+        self.assertEquals(2, parser.parsed)
+
+    def test_ignores_precompiled_file_of_other_format(self):
+        parser = CountingParser()
+        with open(get_precompiled_path(self.path), 'w+') as cachefile:
+            cachefile.write('something else\n')
+
+        self.assertEquals('My Custom Workflow',
+                          load_specification(self.path, parser).title)
+        self.assertEquals(1, parser.parsed)
+
+    def test_ignores_precompiled_file_of_other_version(self):
+        parser = CountingParser()
+        load_specification(self.path, parser)
+
+        path = get_precompiled_path(self.path)
+        with open(path, 'rb') as cachefile:
+            cachefile.readline()
+            payload = cachefile.read()
+
+        with open(path, 'wb') as cachefile:
+            cachefile.write(get_precompiled_header().replace(
+                    ':%s:' % get_lawgiver_version(), ':0.1:'))
+            cachefile.write(payload)
+
+        load_specification(self.path, parser)
+        self.assertEquals(2, parser.parsed)
+
+    def test_parses_again_when_the_payload_is_malformed(self):
+        parser = CountingParser()
+        with open(self.path) as specfile:
+            source_hash = get_source_hash(specfile.read())
+
+        with open(get_precompiled_path(self.path), 'wb') as cachefile:
+            cachefile.write(get_precompiled_header())
+            marshal.dump((source_hash, {'title': 'Broken'}), cachefile)
+
+        self.assertEquals('My Custom Workflow',
+                          load_specification(self.path, parser).title)
+        self.assertEquals(1, parser.parsed)
+
+    def test_invalid_specifications_are_not_precompiled(self):
+        with open(self.path, 'w+') as specfile:
+            specfile.write('[Foo]\nbar = baz')
+
+        with self.assertRaises(ParsingError):
+            load_specification(self.path, SpecificationParser())
+
+        self.assertEquals(None, load_specification(
+                self.path, SpecificationParser(), silent=True))
+        self.assertFalse(os.path.exists(get_precompiled_path(self.path)))
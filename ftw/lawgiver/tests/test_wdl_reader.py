@@ -0,0 +1,95 @@
+from StringIO import StringIO
+from ftw.lawgiver.exceptions import ParsingError
+from ftw.lawgiver.wdl.reader import SpecificationReader
+from unittest2 import TestCase
+
+
+class TestSpecificationReader(TestCase):
+
+    def read(self, *lines):
+        reader = SpecificationReader(StringIO('\n'.join(lines)))
+        return reader, list(reader)
+
+    def test_yields_options_with_line_numbers(self):
+        reader, options = self.read(
+            '# a comment',
+            '[My Workflow]',
+            'Description: The description ; a comment',
+            '',
+            'Transitions:',
+            '  publish (Private => Public)',
+            '',
+            '  retract (Public => Private)')
+
+        self.assertEquals('My Workflow', reader.title)
+        self.assertEquals(2, reader.title_line_number)
+        self.assertEquals(
+            [('Description', ['The description'], 3),
+             ('Transitions', ['', 'publish (Private => Public)',
+                              'retract (Public => Private)'], 5)],
+            options)
+
+    def test_value_line_numbers_and_columns(self):
+        reader = SpecificationReader(StringIO('\n'.join((
+                        '[My Workflow]',
+                        'Description:   The description',
+                        'Transitions:',
+                        '  publish (Private => Public)',
+                        '    retract (Public => Private)'))))
+
+        self.assertEquals(
+            [('Description', [2], [16]),
+             ('Transitions', [3, 4, 5], [13, 3, 5])],
+            [(name, reader.value_line_numbers, reader.value_line_columns)
+             for name, lines, line_number in reader])
+
+    def test_invalid_line_reports_line_and_column(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.read('[Foo]',
+                      'Description: Foo',
+                      '',
+                      'this is wrong')
+
+        self.assertEquals(
+            'Line has an invalid format (line 4, column 1): "this is wrong"',
+            str(cm.exception))
+        self.assertEquals((4, 1), (cm.exception.line, cm.exception.column))
+
+    def test_indented_line_without_option(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.read('[Foo]',
+                      '   foo')
+
+        self.assertEquals((2, 4), (cm.exception.line, cm.exception.column))
+
+    def test_option_before_section(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.read('Description: Foo',
+                      '[Foo]')
+
+        self.assertEquals(1, cm.exception.line)
+
+    def test_second_section(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.read('[Foo]',
+                      'Description: Foo',
+                      '[Bar]')
+
+        self.assertEquals(3, cm.exception.line)
+
+    def test_repeating_the_section_is_allowed(self):
+        reader, options = self.read('[Foo]',
+                                    'Description: Foo',
+                                    '[Foo]',
+                                    'Initial Status: Private')
+
+        self.assertEquals(['Description', 'Initial Status'],
+                          [name for name, lines, line_number in options])
+
+    def test_empty_stream(self):
+        with self.assertRaises(ParsingError) as cm:
+            self.read('')
+
+        self.assertEquals('Exactly one ini-style section is required,'
+                          ' containing the workflow title.',
+                          str(cm.exception))
@@ -35,6 +35,61 @@ class TestSpecification(TestCase):
         self.assertEquals('Definition of initial status "Foo" not found.',
                           str(cm.exception))
 
+    def test_transition_lookups(self):
+        private = Status('Private', [])
+        pending = Status('Pending', [])
+        public = Status('Public', [])
+        submit = Transition('submit', private, pending)
+        publish_private = Transition('publish', private, public)
+        publish_pending = Transition('publish', pending, public)
+
+        obj = Specification('My Workflow', transitions=[
+                submit, publish_private, publish_pending])
+
+        self.assertEquals(submit, obj.get_transition_by_title('submit'))
+        self.assertEquals(publish_private,
+                          obj.get_transition_by_title('publish'))
+        self.assertEquals(None, obj.get_transition_by_title('retract'))
+
+        self.assertEquals([submit, publish_private],
+                          obj.get_transitions_by_src_status(private))
+        self.assertEquals([publish_pending],
+                          obj.get_transitions_by_src_status(pending))
+        self.assertEquals([], obj.get_transitions_by_src_status(public))
+
+    def test_reindexing_transitions(self):
+        private = Status('Private', [])
+        public = Status('Public', [])
+        obj = Specification('My Workflow')
+        self.assertEquals(None, obj.get_transition_by_title('publish'))
+
+        publish = Transition('publish', private, public)
+        obj.transitions.append(publish)
+        obj.index_transitions()
+        self.assertEquals(publish, obj.get_transition_by_title('publish'))
+
+    def test_changing_transitions_resets_the_index(self):
+        private = Status('Private', [])
+        public = Status('Public', [])
+        obj = Specification('My Workflow')
+        self.assertEquals(None, obj.get_transition_by_title('publish'))
+
+        publish = Transition('publish', private, public)
+        obj.transitions.append(publish)
+        self.assertEquals(publish, obj.get_transition_by_title('publish'))
+        self.assertEquals([publish],
+                          obj.get_transitions_by_src_status(private))
+
+        obj.transitions.remove(publish)
+        self.assertEquals(None, obj.get_transition_by_title('publish'))
+
+        retract = Transition('retract', public, private)
+        obj.transitions = [retract]
+        self.assertEquals(retract, obj.get_transition_by_title('retract'))
+
+        obj.transitions[0] = publish
+        self.assertEquals(None, obj.get_transition_by_title('retract'))
+
 
 class TestStatus(TestCase):
 
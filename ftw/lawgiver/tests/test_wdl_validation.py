@@ -0,0 +1,89 @@
+from StringIO import StringIO
+from ftw.lawgiver.wdl.validation import validate_specification
+from unittest2 import TestCase
+
+
+class TestValidateSpecification(TestCase):
+
+    def validate(self, *lines, **kwargs):
+        return validate_specification(StringIO('\n'.join(lines)), **kwargs)
+
+    def test_valid_specification(self):
+        self.assertEquals([], self.validate(
+                '[Foo]',
+                'Initial Status: Private',
+                'Role mapping:',
+                '  editor => Editor',
+                'Status Private:',
+                '  An editor can view this content.',
+                '  An editor can publish.',
+                'Transitions:',
+                '  publish (Private => Private)',
+                action_groups=['view']))
+
+    def test_collects_all_problems_with_line_numbers(self):
+        self.assertEquals(
+            [(3, 'The option "Bogus" is not valid.'),
+             (6, 'Invalid format in role mapping: "this is wrong"'),
+             (9, 'The customer role "publisher" is not mapped to a Plone'
+              ' role in the role mapping.'),
+             (10, 'Action "fly" is neither action group nor transition.'),
+             (13, 'No such dest_status "Published" (publish).'),
+             (14, 'Transition line has an invalid format:'
+              ' "retract Published -> Private"')],
+            self.validate(
+                '[Foo]',
+                'Initial Status: Private',
+                'Bogus: option',
+                'Role mapping:',
+                '  editor => Editor',
+                '  this is wrong',
+                'Status Private:',
+                '  An editor can view this content.',
+                '  A publisher can edit this content.',
+                '  An editor can fly.',
+                '  An editor can publish.',
+                'Transitions:',
+                '  publish (Private => Published)',
+                '  retract Published -> Private',
+                action_groups=['view', 'edit']))
+
+    def test_actions_are_not_checked_without_action_groups(self):
+        self.assertEquals([], self.validate(
+                '[Foo]',
+                'Initial Status: Private',
+                'Role mapping: editor => Editor',
+                'Status Private:',
+                '  An editor can fly.'))
+
+    def test_undefined_initial_status(self):
+        self.assertEquals(
+            [(2, 'Definition of initial status "Pending" not found.')],
+            self.validate(
+                '[Foo]',
+                'Initial Status: Pending',
+                'Status Private:'))
+
+    def test_invalid_lines(self):
+        self.assertEquals(
+            [(2, 'Line has an invalid format (line 2, column 1):'
+              ' "this is wrong"'),
+             (4, 'Unkown statement format: "This is not a statement."')],
+            self.validate(
+                '[Foo]',
+                'this is wrong',
+                'Initial Status: Private',
+                'Status Private: This is not a statement.'))
+
+    def test_circular_role_inheritance(self):
+        self.assertEquals(
+            [(6, 'Circular role inheritance: editor, reviewer.')],
+            self.validate(
+                '[Foo]',
+                'Initial Status: Private',
+                'Role mapping:',
+                '  editor => Editor',
+                '  reviewer => Reviewer',
+                'Status Private:',
+                '  An editor can perform the same actions as a reviewer.',
+                '  A reviewer can perform the same actions as an editor.'))
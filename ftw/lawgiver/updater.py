@@ -0,0 +1,393 @@
+from Products.CMFCore.utils import getToolByName
+from ZODB.POSException import ConflictError
+from ftw.lawgiver.interfaces import IWorkflowSecurityUpdater
+from persistent.list import PersistentList
+from persistent.mapping import PersistentMapping
+from zope.annotation.interfaces import IAnnotations
+from zope.component.hooks import getSite
+from zope.interface import implements
+import os
+import socket
+import time
+import transaction
+
+
+PROGRESS_ANNOTATION_KEY = 'ftw.lawgiver:security-update-progress'
+PARTITIONS_ANNOTATION_KEY = 'ftw.lawgiver:security-update-partitions'
+
+# Seconds without heartbeat after which a running partition is released.
+RELEASE_TIMEOUT = 30 * 60
+
+# Times a conflicting chunk of a partition is retried in a row.
+CONFLICT_RETRIES = 3
+
+
+class WorkflowSecurityUpdater(object):
+    implements(IWorkflowSecurityUpdater)
+
+    def update(self, workflow_id, states=None):
+        workflow = self._get_workflow(workflow_id)
+        if workflow is None:
+            return 0
+
+        updated = 0
+        for brain in self._query(workflow_id, states):
+            if self.update_object(workflow, brain._unrestrictedGetObject()):
+                updated += 1
+
+        return updated
+
+    def update_batched(self, workflow_id, states=None, batch_size=500):
+        self._set_progress(workflow_id, {
+                'states': states is not None and sorted(states) or None,
+                'cursor': None,
+                'processed': 0,
+                'updated': 0,
+                'total': len(self._query(workflow_id, states))})
+        transaction.commit()
+
+        return self.resume(workflow_id, batch_size=batch_size)
+
+    def resume(self, workflow_id, batch_size=500):
+        progress = self.get_progress(workflow_id)
+        if progress is None:
+            return 0
+
+        self._process_chunks(
+            workflow_id, progress, batch_size,
+            lambda progress: self._set_progress(workflow_id, progress))
+
+        self._set_progress(workflow_id, None)
+        transaction.commit()
+        return progress['updated']
+
+    def create_partitions(self, workflow_id, states=None, partitions=4,
+                          batch_size=500):
+        total = len(self._query(workflow_id, states))
+        amount = min(partitions, total)
+        ends = []
+        sizes = []
+
+        if amount > 0:
+            size, rest = divmod(total, amount)
+            sizes = [size + (index < rest and 1 or 0)
+                     for index in range(amount)]
+            ends = self._find_partition_ends(workflow_id, states,
+                                             sizes[:-1], batch_size)
+            # The last partition is open, so that objects added in the
+            # meantime are updated too.
+            ends.append(None)
+            sizes[len(ends) - 1] = total - sum(sizes[:len(ends) - 1])
+
+        records = []
+        cursor = None
+        for end, partition_size in zip(ends, sizes):
+            records.append({
+                    'states': states is not None and sorted(states) or None,
+                    # The cursor is exclusive, the end inclusive.
+                    'cursor': cursor,
+                    'end': end,
+                    'processed': 0,
+                    'updated': 0,
+                    'total': partition_size,
+                    'status': 'pending',
+                    'worker': None,
+                    'heartbeat': None})
+            cursor = end
+
+        self._set_partitions(workflow_id, records)
+        transaction.commit()
+        return len(records)
+
+    def work_partitions(self, workflow_id, batch_size=500):
+        worker = '%s:%s' % (socket.gethostname(), os.getpid())
+        updated = 0
+
+        while True:
+            index = self._claim_partition(workflow_id, worker)
+            if index is None:
+                return updated
+
+            updated_before = self.get_partitions(workflow_id)[index][
+                'updated']
+            partition = self._work_partition(workflow_id, index, worker,
+                                             batch_size)
+            if partition is None:
+                # The partition was released and claimed by another
+                # worker in the meantime.
+                continue
+
+            updated += partition['updated'] - updated_before
+
+            partition['status'] = 'done'
+            self._store_partition(workflow_id, index, partition)
+            transaction.commit()
+
+    def get_partitions(self, workflow_id):
+        partitions = IAnnotations(getSite()).get(
+            PARTITIONS_ANNOTATION_KEY, {}).get(workflow_id)
+        if partitions is None:
+            return None
+        return [dict(partition) for partition in partitions]
+
+    def release_partitions(self, workflow_id, timeout=RELEASE_TIMEOUT):
+        released = 0
+        for index, partition in enumerate(
+                self.get_partitions(workflow_id) or []):
+            if partition['status'] == 'running' and \
+                    time.time() - (partition['heartbeat'] or 0) >= timeout:
+                partition['status'] = 'pending'
+                partition['worker'] = None
+                partition['heartbeat'] = None
+                self._store_partition(workflow_id, index, partition)
+                released += 1
+
+        transaction.commit()
+        return released
+
+    def finish_partitions(self, workflow_id):
+        partitions = self.get_partitions(workflow_id)
+        if partitions is None or [partition for partition in partitions
+                                  if partition['status'] != 'done']:
+            return None
+
+        self._set_partitions(workflow_id, None)
+        transaction.commit()
+        return sum(partition['updated'] for partition in partitions)
+
+    def get_progress(self, workflow_id):
+        progress = IAnnotations(getSite()).get(
+            PROGRESS_ANNOTATION_KEY, {}).get(workflow_id)
+        return progress is not None and dict(progress) or None
+
+    def get_portal_types(self, workflow_id):
+        wftool = getToolByName(getSite(), 'portal_workflow')
+        ttool = getToolByName(getSite(), 'portal_types')
+
+        return sorted(
+            portal_type for portal_type in ttool.objectIds()
+            if workflow_id in wftool.getChainForPortalType(portal_type))
+
+    def get_query(self, workflow_id, states=None):
+        query = {'portal_type': self.get_portal_types(workflow_id)}
+
+        if states is not None:
+            query['review_state'] = sorted(states)
+
+        return query
+
+    def get_permission_map(self, workflow_id):
+        workflow = self._get_workflow(workflow_id)
+        if workflow is None:
+            return None
+
+        states = {}
+        for state_id, state in workflow.states.items():
+            permission_roles = state.permission_roles or {}
+            states[state_id] = dict(
+                # A tuple means the permission is not acquired.
+                (permission, (isinstance(roles, tuple), sorted(roles)))
+                for permission, roles in permission_roles.items())
+
+        return {'permissions': sorted(workflow.permissions),
+                'states': states}
+
+    def get_changed_states(self, old_map, new_map):
+        if new_map is None:
+            return []
+
+        if old_map is None or \
+                old_map['permissions'] != new_map['permissions']:
+            return sorted(new_map['states'])
+
+        state_ids = set(old_map['states']) | set(new_map['states'])
+        return sorted(
+            state_id for state_id in state_ids
+            if old_map['states'].get(state_id) !=
+            new_map['states'].get(state_id))
+
+    def update_object(self, workflow, obj):
+        # The chain of the object may be placeful or overridden, the
+        # portal type is not enough.
+        wftool = getToolByName(obj, 'portal_workflow')
+        if workflow.getId() not in wftool.getChainFor(obj):
+            return False
+
+        if not workflow.updateRoleMappingsFor(obj):
+            return False
+
+        obj.reindexObject(idxs=['allowedRolesAndUsers'])
+        return True
+
+    def _query(self, workflow_id, states):
+        query = self.get_query(workflow_id, states)
+        if not query['portal_type'] or query.get('review_state') == []:
+            return []
+
+        catalog = getToolByName(getSite(), 'portal_catalog')
+        return catalog.unrestrictedSearchResults(query)
+
+    def _process_chunks(self, workflow_id, progress, batch_size, store):
+        """Updates the objects after the cursor of the `progress` chunk by
+        chunk. After each chunk the `progress` is stored by calling `store`
+        with it, the transaction is committed and the ZODB cache minimized.
+        """
+        workflow = self._get_workflow(workflow_id)
+        while workflow is not None:
+            brains = self._query_chunk(workflow_id, progress, batch_size)
+            if not brains:
+                break
+
+            for brain in brains:
+                if self.update_object(workflow,
+                                      brain._unrestrictedGetObject()):
+                    progress['updated'] += 1
+                progress['processed'] += 1
+                progress['cursor'] = brain.UID
+
+            store(progress)
+            transaction.commit()
+            getSite()._p_jar.cacheMinimize()
+
+    def _find_partition_ends(self, workflow_id, states, sizes, batch_size):
+        """Walks the UIDs in chunks of `batch_size` and returns the UID of
+        the last object of each partition of the given `sizes`.
+        Only the ends are kept in memory.
+        """
+        progress = {'states': states, 'cursor': None}
+        ends = []
+        remaining = list(sizes)
+
+        while remaining:
+            brains = self._query_chunk(workflow_id, progress, batch_size)
+            if not brains:
+                break
+
+            for brain in brains:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    ends.append(brain.UID)
+                    remaining.pop(0)
+                    if not remaining:
+                        break
+
+            progress['cursor'] = brains[-1].UID
+
+        return ends
+
+    def _query_chunk(self, workflow_id, progress, batch_size):
+        """Returns the next `batch_size` brains after the cursor of the
+        `progress` up to its optional ``end`` UID, sorted by UID so that
+        the order is stable between transactions.
+        """
+        query = self.get_query(workflow_id, progress['states'])
+        if not query['portal_type'] or query.get('review_state') == []:
+            return []
+
+        query['sort_on'] = 'UID'
+        if batch_size is not None:
+            query['sort_limit'] = batch_size + 1
+
+        cursor = progress['cursor']
+        end = progress.get('end')
+        if cursor is not None and end is not None:
+            query['UID'] = {'query': (cursor, end), 'range': 'min:max'}
+        elif cursor is not None:
+            query['UID'] = {'query': cursor, 'range': 'min'}
+        elif end is not None:
+            query['UID'] = {'query': end, 'range': 'max'}
+
+        catalog = getToolByName(getSite(), 'portal_catalog')
+        brains = [brain for brain in catalog.unrestrictedSearchResults(query)
+                  if brain.UID != cursor]
+        return brains[:batch_size]
+
+    def _work_partition(self, workflow_id, index, worker, batch_size):
+        """Updates the objects of the claimed partition at `index` and
+        returns the partition. When a chunk conflicts, it is retried from
+        the stored cursor up to `CONFLICT_RETRIES` times in a row.
+        Returns `None` when the partition was claimed by another worker in
+        the meantime.
+        """
+        def store(partition):
+            partition['heartbeat'] = time.time()
+            self._store_partition(workflow_id, index, partition)
+
+        partition = self.get_partitions(workflow_id)[index]
+        conflicts = 0
+
+        while True:
+            processed = partition['processed']
+            try:
+                self._process_chunks(workflow_id, partition, batch_size,
+                                     store)
+            except ConflictError:
+                transaction.abort()
+                partition = self.get_partitions(workflow_id)[index]
+                if partition['worker'] != worker:
+                    return None
+
+                if partition['processed'] > processed:
+                    conflicts = 0
+                conflicts += 1
+                if conflicts > CONFLICT_RETRIES:
+                    raise
+            else:
+                return partition
+
+    def _claim_partition(self, workflow_id, worker):
+        """Marks the first pending partition as running by `worker` and
+        commits. Returns the index of the partition or `None`.
+        Workers claiming at the same time conflict on commit, the loser
+        retries with the next pending partition.
+        """
+        while True:
+            partitions = self.get_partitions(workflow_id) or []
+            pending = [index for index, partition in enumerate(partitions)
+                       if partition['status'] == 'pending']
+            if not pending:
+                return None
+
+            partition = partitions[pending[0]]
+            partition['status'] = 'running'
+            partition['worker'] = worker
+            partition['heartbeat'] = time.time()
+            self._store_partition(workflow_id, pending[0], partition)
+
+            try:
+                transaction.commit()
+            except ConflictError:
+                transaction.abort()
+            else:
+                return pending[0]
+
+    def _set_progress(self, workflow_id, progress):
+        annotations = IAnnotations(getSite())
+        if PROGRESS_ANNOTATION_KEY not in annotations:
+            annotations[PROGRESS_ANNOTATION_KEY] = PersistentMapping()
+
+        if progress is not None:
+            annotations[PROGRESS_ANNOTATION_KEY][workflow_id] = dict(progress)
+        elif workflow_id in annotations[PROGRESS_ANNOTATION_KEY]:
+            del annotations[PROGRESS_ANNOTATION_KEY][workflow_id]
+
+    def _set_partitions(self, workflow_id, partitions):
+        annotations = IAnnotations(getSite())
+        if PARTITIONS_ANNOTATION_KEY not in annotations:
+            annotations[PARTITIONS_ANNOTATION_KEY] = PersistentMapping()
+
+        if partitions is not None:
+            annotations[PARTITIONS_ANNOTATION_KEY][workflow_id] = \
+                PersistentList(map(PersistentMapping, partitions))
+        elif workflow_id in annotations[PARTITIONS_ANNOTATION_KEY]:
+            del annotations[PARTITIONS_ANNOTATION_KEY][workflow_id]
+
+    def _store_partition(self, workflow_id, index, partition):
+        # Each partition is a persistent object of its own, so that workers
+        # committing progress of different partitions do not conflict.
+        IAnnotations(getSite())[PARTITIONS_ANNOTATION_KEY][workflow_id][
+            index].update(partition)
+
+    def _get_workflow(self, workflow_id):
+        wftool = getToolByName(getSite(), 'portal_workflow')
+        return wftool.getWorkflowById(workflow_id)
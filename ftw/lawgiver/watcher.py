@@ -0,0 +1,140 @@
+from threading import Lock
+import os
+
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+WATCH_MASK = pyinotify and (pyinotify.IN_CREATE |
+                            pyinotify.IN_DELETE |
+                            pyinotify.IN_MOVED_FROM |
+                            pyinotify.IN_MOVED_TO) or 0
+
+
+class SpecificationFileWatcher(object):
+    """Keeps the specification files of generic setup profile directories
+    in memory.
+
+    The profile directories are watched with inotify when `pyinotify` is
+    installed and the files are only scanned again after the file system
+    reported changes.
+    Without inotify the modification times of the workflows directory and
+    of the workflow directories found by the last scan are compared.
+    """
+
+    def __init__(self, use_inotify=True):
+        self._lock = Lock()
+        self._files = {}
+        self._stamps = {}
+        self._directories = {}
+        self._dirty = set()
+        self._watched = set()
+        self._manager = None
+        self._notifier = None
+
+        if use_inotify and pyinotify is not None:
+            self._start_notifier()
+
+    def get_specification_files(self, profile_directory, scanner):
+        """Returns the specification files of the `profile_directory`.
+        The `scanner` is called with the profile directory for listing
+        the files when they are not known or may have changed.
+        """
+        with self._lock:
+            if profile_directory in self._watched:
+                return self._get_watched(profile_directory, scanner)
+            else:
+                return self._get_polled(profile_directory, scanner)
+
+    def stop(self):
+        if self._notifier is not None:
+            self._notifier.stop()
+            self._notifier = None
+        self._watched.clear()
+
+    def _get_watched(self, profile_directory, scanner):
+        if profile_directory in self._dirty:
+            self._dirty.discard(profile_directory)
+            self._files[profile_directory] = tuple(scanner(profile_directory))
+        return self._files[profile_directory]
+
+    def _get_polled(self, profile_directory, scanner):
+        workflows = os.path.join(profile_directory, 'workflows')
+
+        if profile_directory in self._files and \
+                self._stamps[profile_directory] == self._get_stamp(
+                workflows, self._directories[profile_directory]):
+            return self._files[profile_directory]
+
+        # Watch before scanning, so that no change gets lost.
+        self._watch(profile_directory)
+        self._dirty.discard(profile_directory)
+
+        # Take the stamp before scanning, so that changes while scanning
+        # are detected by the next poll. The workflows directory is stat'ed
+        # before listing it for the same reason.
+        workflows_mtime = self._get_mtime(workflows)
+        directories = self._directories[profile_directory] = \
+            self._list_directories(workflows)
+        self._stamps[profile_directory] = (workflows_mtime, ) + tuple(
+            map(self._get_mtime, directories))
+
+        files = self._files[profile_directory] = tuple(
+            scanner(profile_directory))
+        return files
+
+    def _get_stamp(self, workflows, directories):
+        """Returns the modification times of the `workflows` directory and
+        of the workflow `directories`.
+        Directories created later change the modification time of the
+        workflows directory, so it does not need to be listed again.
+        """
+        return tuple(map(self._get_mtime, [workflows] + directories))
+
+    def _get_mtime(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _list_directories(self, workflows):
+        try:
+            names = sorted(os.listdir(workflows))
+        except OSError:
+            return []
+
+        return filter(os.path.isdir,
+                      [os.path.join(workflows, name) for name in names])
+
+    def _start_notifier(self):
+        watcher = self
+
+        class EventHandler(pyinotify.ProcessEvent):
+            def process_default(self, event):
+                watcher._mark_dirty(event.pathname)
+
+        self._manager = pyinotify.WatchManager()
+        self._notifier = pyinotify.ThreadedNotifier(self._manager,
+                                                    EventHandler())
+        self._notifier.daemon = True
+        self._notifier.start()
+
+    def _watch(self, profile_directory):
+        if self._notifier is None or not os.path.isdir(profile_directory):
+            return
+
+        descriptors = self._manager.add_watch(
+            profile_directory, WATCH_MASK, rec=True, auto_add=True,
+            quiet=True)
+        if descriptors and min(descriptors.values()) >= 0:
+            self._watched.add(profile_directory)
+
+    def _mark_dirty(self, path):
+        with self._lock:
+            for profile_directory in self._watched:
+                if path == profile_directory or \
+                        path.startswith(profile_directory + os.sep):
+                    self._dirty.add(profile_directory)
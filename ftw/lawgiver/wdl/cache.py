@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from ftw.lawgiver.wdl.interfaces import IWorkflowSpecificationParser
+from ftw.lawgiver.wdl.precompiled import load_specification
+from threading import Lock
+from zope.component import getUtility
+import os
+
+
+class SpecificationCache(object):
+    """A process wide LRU cache of parsed specifications.
+    A cached specification is reused as long as the modification time and
+    the size of its file do not change.
+    On a miss the specification is loaded from the precompiled
+    ``.spec.cache`` when possible (see `ftw.lawgiver.wdl.precompiled`).
+    Specifications which could not be parsed are not cached.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, path, silent=False):
+        """Returns the parsed specification of the file at `path`.
+        If `silent` is `True`, `None` is returned on parsing errors.
+        """
+        stat = os.stat(path)
+        stamp = (stat.st_mtime, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None and entry[0] == stamp:
+                self._entries[path] = entry
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+
+        specification = load_specification(
+            path, getUtility(IWorkflowSpecificationParser), silent=silent)
+
+        if specification is not None:
+            self._store(path, stamp, specification)
+
+        return specification
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _store(self, path, stamp, specification):
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = (stamp, specification)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+SPECIFICATION_CACHE = SpecificationCache()
+
+
+def get_specification(path, silent=False):
+    """Returns the parsed specification of the file at `path` from the
+    process wide specification cache.
+    """
+    return SPECIFICATION_CACHE.get(path, silent=silent)
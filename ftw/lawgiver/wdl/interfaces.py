@@ -17,6 +17,15 @@ class IWorkflowSpecificationParser(Interface):
         If `silent` is `True` it returns `None` on any error.
         """
 
+    def serialize(specification):
+        """Returns the parsed `specification` as builtin types (dicts, lists,
+        tuples and strings), which can be stored with `marshal`.
+        """
+
+    def deserialize(data):
+        """Creates the specification again from the result of `serialize`.
+        """
+
 
 class ISpecification(Interface):
     """Represents a specification file.
@@ -32,6 +41,22 @@ class ISpecification(Interface):
         """Returns the `IStatus` object of the initial status.
         """
 
+    def index_transitions():
+        """(Re)builds the transition lookup index.
+        The index is built lazily on the first lookup and built again after
+        the transitions were changed.
+        """
+
+    def get_transition_by_title(title):
+        """Returns the first `ITransition` object with the title `title`
+        or `None`.
+        """
+
+    def get_transitions_by_src_status(status):
+        """Returns a list of all `ITransition` objects starting at the
+        `IStatus` object `status`.
+        """
+
     def validate():
         """Validates the specification.
         Raises an exception when an error occurs,
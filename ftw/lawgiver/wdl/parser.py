@@ -1,28 +1,38 @@
 from ftw.lawgiver.exceptions import ParsingError
 from ftw.lawgiver.wdl.interfaces import IWorkflowSpecificationParser
+from ftw.lawgiver.wdl.reader import SpecificationReader
 from ftw.lawgiver.wdl.specification import Specification
 from ftw.lawgiver.wdl.specification import Status
 from ftw.lawgiver.wdl.specification import Transition
 from zope.interface import implements
-import ConfigParser
 import re
 
 
 def consumer(constraint):
     """Decorator for consuming a certain kind of option.
-    The passed option name constraint is a regular expression used with match.
+    The passed option name constraint is either a list of literal option
+    names, which are looked up case insensitively, or a regular expression
+    used with match.
     The method gets a ``specargs`` dict passed in which will be used as
     keyword arguments for creating the Specification object.
+    For literal option names the ``match`` is ``None``.
 
     Example usage:
 
-    >>> @consumer(r'[Dd]escription')
+    >>> @consumer(['Description'])
     ... def convert_description(self, match, value, specargs):
     ...     specargs['description'] = value
+
+    >>> @consumer(r'^[Ss]tatus (.*)$')
+    ... def convert_status(self, match, value, specargs):
+    ...     title = match.groups()[0]
     """
 
     def _decorator(func):
-        func.consumer_constraint = re.compile(constraint)
+        if isinstance(constraint, (list, tuple)):
+            func.consumer_names = tuple(name.lower() for name in constraint)
+        else:
+            func.consumer_constraint = re.compile(constraint)
         return func
     return _decorator
 
@@ -32,86 +42,71 @@ ROLE_INHERITANCE_STATEMENT = 'role inheritance statement'
 WORKLIST_STATEMENT = 'worklist statement'
 
 
-def convert_statement(statement):
-    result = _convert_worklist_statement(statement)
-    if result:
-        return WORKLIST_STATEMENT, result
-
-    result = _convert_role_inheritance_statement(statement)
-    if result:
-        return ROLE_INHERITANCE_STATEMENT, result
+# The grammar of all statements, matched against the lower cased statement.
+# The article is matched atomically (lookahead and backreference), so that
+# it is never taken for a role. Roles and actions are matched word by word.
+STATEMENT_XPR = re.compile(r"""
+    ^(?:(?=(an?\ ))\1)?
+    (?P<role>[^ ]+(?:\ [^ ]+)*?)
+    \ can\ (?:always\ )?
+    (?:
+        (?P<worklist>access\ the\ worklist)
 
-    result = _convert_permission_statement(statement)
-    if result:
-        return PERMISSION_STATEMENT, result
+      | perform(?:\ the\ same(?:\ actions)?\ as\ an?)?
+        \ (?P<inherited>.*?)\.?$
 
-    raise ParsingError('Unkown statement format: "%s"' % statement)
+      | (?P<action>[^ ]*[^ .](?:\ [^ ]*[^ .])*?)
+        (?:\ (?:(?:on\ this|this|the|that|any)\ conte[nx]t
+               |(?:new\ )?content))?
+        \.?$
+    )
+    """, re.VERBOSE)
 
 
-def _cleanup_statement(statement):
-    """Removes prefix and literals which are not intersting in general.
+def convert_statement(statement):
+    """Classifies the `statement` and extracts its parts in one pass with the
+    statement grammar. Worklist statements win over role inheritance
+    statements, which win over permission statements.
+    The roles are lower cased, the action keeps its case.
     """
-    # remove leading prefixes
-    statement = re.sub(r'^(?:[Aa] |[Aa]n )', '', statement)
-
-    # always
-    statement = statement.replace(' can always ', ' can ')
-
-    return statement
-
-
-def _convert_worklist_statement(statement):
-    text = _cleanup_statement(statement.lower())
-
-    match = re.match(r'(.*?) can access the worklist.?', text)
-    if match:
-        return match.groups()[0]
-
-    else:
-        return None
-
-
-def _convert_role_inheritance_statement(statement):
-    text = _cleanup_statement(statement.lower())
-    if 'can perform' not in text:
-        return None
+    match = STATEMENT_XPR.match(statement.lower())
+    if match is None:
+        raise ParsingError('Unkown statement format: "%s"' % statement)
 
-    text = re.sub(
-        r'(?:\.$'
-        r'| perform the same(?: actions)? as a[n]?'
-        r')',
-        '', text)
+    _article, role, worklist, inherited, action = match.groups()
+    if worklist is not None:
+        return WORKLIST_STATEMENT, role
 
-    text = re.sub(' +', ' ', text)
-    return tuple(text.split(' can '))
+    if inherited is not None:
+        return ROLE_INHERITANCE_STATEMENT, (role, inherited)
 
+    action = statement[match.start('action'):match.end('action')]
+    if ' can ' in action.lower():
+        raise ParsingError('Unkown statement format: "%s"' % statement)
 
-def _convert_permission_statement(statement):
-    text = _cleanup_statement(statement)
+    return PERMISSION_STATEMENT, (role, action)
 
-    # remove trailing "this content" and such.
-    text = re.sub(
-        r'(?:\.'
-        r'| on this conte[nx]t\.?'
-        r'| this conte[nx]t\.?'
-        r'| the conte[nx]t\.?'
-        r'| that conte[nx]t\.?'
-        r'| any conte[nx]t\.?'
-        r'| new content\.?'
-        r'| content\.?'
-        r')$',
-        '', text)
 
-    # always
-    text = text.replace(' can always ', ' can ')
+def read_specification_header(stream):
+    """Reads only the section name (the workflow title) and the description
+    of a specification without parsing the rest of the `stream`.
+    Returns a dict with the keys `title` and `description` or `None` when
+    there is no section.
+    """
+    reader = SpecificationReader(stream)
 
     try:
-        role, action = text.split(' can ')
-    except ValueError:
+        for name, lines, line_number in reader:
+            if name.lower() == 'description':
+                return {'title': reader.title,
+                        'description': '\n'.join(lines)}
+    except ParsingError:
+        pass
+
+    if reader.title is None:
         return None
-
-    role = role.lower()
-    return role, action
+    return {'title': reader.title,
+            'description': None}
 
 
 class SpecificationParser(object):
@@ -119,60 +114,109 @@ class SpecificationParser(object):
     implements(IWorkflowSpecificationParser)
 
     def __init__(self):
-        self._config = None
         self._spec = None
+        self._reader = None
 
     def __call__(self, stream, silent=False):
         try:
             return self._parse(stream)
-        except (ParsingError, ConfigParser.ParsingError):
+        except ParsingError:
             if silent:
                 return None
             else:
                 raise
 
-    def _parse(self, stream):
-        self._read_stream(stream)
-        self._convert()
+    def serialize(self, specification):
+        """Converts the `specification` into builtin types only, so that it
+        can be stored with `marshal`.
+        """
+        return {
+            'title': specification.title,
+            'description': specification.description,
+            'initial_status_title': specification._initial_status_title,
+            'custom_transition_url': specification.custom_transition_url,
+            'role_mapping': specification.role_mapping,
+            'generals': specification.generals,
+            'role_inheritance': specification.role_inheritance,
+            'states': [(status.title,
+                        status.statements,
+                        status.role_inheritance,
+                        status.worklist_viewers)
+                       for status in specification.states.values()],
+            'transitions': [(transition.title,
+                             transition._src_status_title,
+                             transition._dest_status_title)
+                            for transition in specification.transitions]}
+
+    def deserialize(self, data):
+        """Creates a specification from the result of `serialize`.
+        """
+        specargs = dict(data)
+        specargs['states'] = dict(
+            (title, Status(title, statements, role_inheritance,
+                           worklist_viewers))
+            for title, statements, role_inheritance, worklist_viewers
+            in data['states'])
+        specargs['transitions'] = [
+            Transition(title=title,
+                       src_status_title=src_status_title,
+                       dest_status_title=dest_status_title)
+            for title, src_status_title, dest_status_title
+            in data['transitions']]
+
+        self._spec = Specification(**specargs)
         self._post_converting()
         return self._spec
 
-    def _read_stream(self, stream):
-        """Parse `stream` into a configparser `self._config` object.
-        """
-
-        self._config = ConfigParser.RawConfigParser()
-        self._config.optionxform = str  # do not lowercase tokens
-        self._config.readfp(stream)
+    def _parse(self, stream):
+        self._reader = SpecificationReader(stream)
+        self._convert(self._reader)
+        self._post_converting()
+        return self._spec
 
-    def _convert(self):
-        """Convert the configparser `self._config` into a ISpecification
+    def _convert(self, reader):
+        """Convert the options read by the `reader` into a ISpecification
         object (`self._spec`).
         """
 
-        if len(self._config.sections()) != 1:
-            raise ParsingError(
-                'Exactly one ini-style section is required,'
-                ' containing the workflow title.')
+        specargs = {'states': {}}
 
-        sectionname = self._config.sections()[0]
-        specargs = {'title': sectionname,
-                    'states': {}}
-
-        for name, value in self._config.items(sectionname):
-            self._call_consumer(name, value, specargs)
+        for name, lines, line_number in reader:
+            self._convert_option(name, '\n'.join(lines), line_number,
+                                 specargs)
 
+        specargs['title'] = reader.title
         self._spec = Specification(**specargs)
 
-    @consumer(r'^[Dd]escription$')
+    def _convert_option(self, name, value, line_number, specargs):
+        try:
+            self._call_consumer(name, value, specargs)
+        except ParsingError, exc:
+            column = None
+            if self._reader is not None:
+                column = self._reader.value_line_columns[0]
+            self._failed(exc, line_number, column)
+
+    def _failed(self, error, line_number, column=None):
+        """Handles the `ParsingError` `error` of the line `line_number`
+        and the `column`. The error is raised with the line number and the
+        column when it has none yet.
+        """
+        if error.line is None:
+            error.line = line_number
+            if error.column is None:
+                error.column = column
+        raise error
+
+    @consumer(['Description'])
     def _convert_description(self, match, value, specargs):
         specargs['description'] = value
 
-    @consumer(r'^[Ii]nitial [Ss]tatus$')
+    @consumer(['Initial Status'])
     def _convert_initial_status(self, match, value, specargs):
         specargs['initial_status_title'] = value
 
-    @consumer(r'^[Tt]ransition[- ](URL|url)$')
+    @consumer(['Transition-URL', 'Transition URL'])
     def _convert_transition_url(self, match, value, specargs):
         specargs['custom_transition_url'] = value
 
@@ -185,9 +229,7 @@ class SpecificationParser(object):
         worklist_viewers = []
 
         if value.strip():
-            lines = map(str.strip, value.strip().split('\n'))
-            for line in lines:
-                type_, item = convert_statement(line)
+            for type_, item in self._convert_lines(value, convert_statement):
                 if type_ == PERMISSION_STATEMENT:
                     statements.append(item)
                 elif type_ == ROLE_INHERITANCE_STATEMENT:
@@ -199,13 +241,10 @@ class SpecificationParser(object):
                                            role_inheritance,
                                            worklist_viewers)
 
-    @consumer(r'^[Tt]ransitions$')
+    @consumer(['Transitions'])
     def _convert_transitions(self, match, value, specargs):
-        raw = map(str.strip, value.strip().split('\n'))
-        transitions = specargs['transitions'] = []
-
-        for line in raw:
-            transitions.append(self._convert_transition_line(line))
+        specargs['transitions'] = self._convert_lines(
+            value, self._convert_transition_line)
 
     def _convert_transition_line(self, line):
         xpr = re.compile(r'([^\(]*?) ?\(([^=]*?) ?=> ?([^\(]*)\)')
@@ -219,61 +258,116 @@ class SpecificationParser(object):
                           src_status_title=src_status_title,
                           dest_status_title=dest_status_title)
 
-    @consumer(r'^[Rr]ole [Mm]apping$')
+    @consumer(['Role Mapping'])
     def _convert_role_mapping(self, match, value, specargs):
-        lines = map(str.strip, value.strip().split('\n'))
-        xpr = re.compile(r'^([^=]*?) ?=> ?(.*)$')
         mapping = specargs['role_mapping'] = {}
 
-        for line in lines:
-            match = xpr.match(line)
-            if not match:
-                raise ParsingError('Invalid format in role mapping: "%s"' % (
-                        line))
-
-            customer_role, plone_role = match.groups()
+        for customer_role, plone_role in self._convert_lines(
+                value, self._convert_role_mapping_line):
             mapping[customer_role.lower()] = plone_role
 
-    @consumer(r'^[Gg]eneral$')
+    def _convert_role_mapping_line(self, line):
+        xpr = re.compile(r'^([^=]*?) ?=> ?(.*)$')
+        match = xpr.match(line)
+        if not match:
+            raise ParsingError('Invalid format in role mapping: "%s"' % (
+                    line))
+
+        return match.groups()
+
+    @consumer(['General'])
     def _convert_general_statements(self, match, value, specargs):
         statements = specargs['generals'] = []
         role_inheritance = specargs['role_inheritance'] = []
 
-        lines = map(str.strip, value.strip().split('\n'))
-        for line in lines:
-            type_, item = convert_statement(line)
+        for type_, item in self._convert_lines(
+                value, self._convert_general_statement):
             if type_ == PERMISSION_STATEMENT:
                 statements.append(item)
 
             elif type_ == ROLE_INHERITANCE_STATEMENT:
                 role_inheritance.append(item)
 
-            elif type_ == WORKLIST_STATEMENT:
-                raise ParsingError('Worklist statements are not allowed'
-                                   ' in the "General" section.')
+    def _convert_general_statement(self, line):
+        type_, item = convert_statement(line)
+        if type_ == WORKLIST_STATEMENT:
+            raise ParsingError('Worklist statements are not allowed'
+                               ' in the "General" section.')
+        return type_, item
+
+    def _convert_lines(self, value, converter):
+        """Converts each line of the multi line option `value` with the
+        `converter` function and returns the results.
+        """
+        results = []
+        for line, line_number, column in self._get_value_lines(value):
+            try:
+                results.append(converter(line))
+            except ParsingError, exc:
+                self._failed(exc, line_number, column)
+
+        return results
+
+    def _get_value_lines(self, value):
+        """Returns the stripped lines of the multi line option `value`
+        together with their line numbers and the columns where they start,
+        which are `None` when unknown.
+        """
+        lines = map(str.strip, value.strip().split('\n'))
+
+        if self._reader is None or self._reader.value_line_numbers is None:
+            return zip(lines, [None] * len(lines), [None] * len(lines))
+
+        # An empty first line (the value starts on the next line) is not
+        # part of the stripped value.
+        return zip(lines,
+                   self._reader.value_line_numbers[-len(lines):],
+                   self._reader.value_line_columns[-len(lines):])
 
     def _post_converting(self):
         for transition in self._spec.transitions:
             transition.augment_states(self._spec.states)
 
+        self._spec.index_transitions()
+
     def _call_consumer(self, optname, optvalue, specargs):
-        for constraint, func in self._get_consumers():
+        names, constraints = self._get_consumers()
+
+        func = names.get(optname.lower())
+        if func is not None:
+            return func(self, None, optvalue, specargs)
+
+        for constraint, func in constraints:
             match = constraint.match(optname)
             if match:
-                return func(match, optvalue, specargs)
+                return func(self, match, optvalue, specargs)
 
-        raise ParsingError('The option "%s" is not valid.' % optname)
+        raise ParsingError('The option "%s" is not valid.' % optname,
+                           column=1)
 
-    def _get_consumers(self):
-        consumers = []
+    @classmethod
+    def _get_consumers(cls):
+        """Returns the dispatch table of the class, which is built once:
+        a dict of lowercase literal option names to consumer functions and
+        a list of (regular expression, consumer function) tuples.
+        """
+        if '_consumers' in cls.__dict__:
+            return cls._consumers
+
+        names = {}
+        constraints = []
 
-        for name in dir(self):
-            item = getattr(self, name, None)
-            if not callable(item):
+        for name in dir(cls):
+            func = getattr(getattr(cls, name, None), 'im_func', None)
+            if func is None:
                 continue
 
-            consumer_constraint = getattr(item, 'consumer_constraint', None)
+            for option in getattr(func, 'consumer_names', ()):
+                names[option] = func
+
+            consumer_constraint = getattr(func, 'consumer_constraint', None)
             if consumer_constraint:
-                consumers.append((consumer_constraint, item))
+                constraints.append((consumer_constraint, func))
 
-        return consumers
+        cls._consumers = names, constraints
+        return cls._consumers
@@ -0,0 +1,113 @@
+from StringIO import StringIO
+from ftw.lawgiver.fingerprint import get_lawgiver_version
+import hashlib
+import marshal
+import os.path
+import tempfile
+
+
+PRECOMPILED_FILENAME = '.spec.cache'
+
+# Increase when the format of the serialized specification changes.
+PRECOMPILED_FORMAT = 1
+
+
+def get_precompiled_path(specification_path):
+    return os.path.join(os.path.dirname(specification_path),
+                        PRECOMPILED_FILENAME)
+
+
+def get_precompiled_header():
+    # Files written by another version of ftw.lawgiver are not used, since
+    # the parser may have changed.
+    return 'ftw.lawgiver-spec-cache:%i:%s:%i\n' % (
+        PRECOMPILED_FORMAT, get_lawgiver_version(), marshal.version)
+
+
+def get_source_hash(specification_data):
+    return hashlib.sha1(specification_data).hexdigest()
+
+
+def read_precompiled(specification_path, specification_data, parser):
+    """Returns the specification stored in the ``.spec.cache`` next to the
+    `specification_path` or `None` when there is no such file, when it
+    was not created from the same `specification_data` by the same version
+    or when it cannot be loaded.
+    """
+    path = get_precompiled_path(specification_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as cachefile:
+            if cachefile.readline() != get_precompiled_header():
+                return None
+
+            source_hash, data = marshal.load(cachefile)
+
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+    if source_hash != get_source_hash(specification_data):
+        return None
+
+    try:
+        return parser.deserialize(data)
+    except Exception:
+        return None
+
+
+def write_precompiled(specification_path, specification_data, specification,
+                      parser):
+    """Writes the `specification` to the ``.spec.cache`` next to the
+    `specification_path`. Nothing is written when the directory is not
+    writable.
+    """
+    path = get_precompiled_path(specification_path)
+    directory = os.path.dirname(path)
+
+    try:
+        fd, tmppath = tempfile.mkstemp(prefix=PRECOMPILED_FILENAME,
+                                       dir=directory)
+    except (IOError, OSError):
+        return False
+
+    try:
+        with os.fdopen(fd, 'wb') as cachefile:
+            cachefile.write(get_precompiled_header())
+            marshal.dump((get_source_hash(specification_data),
+                          parser.serialize(specification)),
+                         cachefile)
+        os.chmod(tmppath, 0644)
+        os.rename(tmppath, path)
+
+    except (IOError, OSError, ValueError):
+        os.remove(tmppath)
+        return False
+
+    return True
+
+
+def load_specification(specification_path, parser, specification_data=None,
+                       silent=False):
+    """Returns the specification at `specification_path`, loaded from the
+    ``.spec.cache`` when it is up to date. Otherwise the specification is
+    parsed and the ``.spec.cache`` is written.
+    If `silent` is `True`, `None` is returned on parsing errors.
+    """
+    if specification_data is None:
+        with open(specification_path) as specfile:
+            specification_data = specfile.read()
+
+    specification = read_precompiled(specification_path, specification_data,
+                                     parser)
+    if specification is not None:
+        return specification
+
+    specification = parser(StringIO(specification_data), silent=silent)
+    if specification is None:
+        return None
+
+    write_precompiled(specification_path, specification_data, specification,
+                      parser)
+    return specification
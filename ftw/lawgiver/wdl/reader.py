@@ -0,0 +1,122 @@
+from ftw.lawgiver.exceptions import ParsingError
+import re
+
+
+# Same expressions as ConfigParser.RawConfigParser.SECTCRE / OPTCRE.
+SECTION_XPR = re.compile(r'\[(?P<header>[^]]+)\]')
+OPTION_XPR = re.compile(
+    r'(?P<option>[^:=\s][^:=]*)\s*(?P<vi>[:=])\s*(?P<value>.*)$')
+
+ONE_SECTION_REQUIRED = ('Exactly one ini-style section is required,'
+                        ' containing the workflow title.')
+
+
+class SpecificationReader(object):
+    """Reads the ini-style specification format line by line in one pass
+    over the `stream`.
+
+    Iterating over the reader yields ``(option, value_lines, line_number)``
+    tuples as soon as an option is complete. The section name (the
+    workflow title) is available as `title` once the section header was
+    read. The line numbers of all lines of the yielded option are available
+    as `value_line_numbers`, the columns where their values start as
+    `value_line_columns`.
+
+    When a list is passed as `errors`, format errors are appended to it as
+    `ParsingError` objects and the reader continues with the next line.
+
+    The dialect is the one of ``ConfigParser.RawConfigParser``: comments
+    start with ``#`` or ``;`` (or ``rem``), values are continued on indented
+    lines, inline comments start with `` ;``.
+    """
+
+    def __init__(self, stream, errors=None):
+        self.stream = stream
+        self.errors = errors
+        self.title = None
+        self.title_line_number = None
+        self.value_line_numbers = None
+        self.value_line_columns = None
+
+    def __iter__(self):
+        option = None
+
+        for line_number, line in enumerate(self.stream, 1):
+            if not line.strip() or line[0] in '#;':
+                continue
+
+            if line[0] in 'rR' and line.split(None, 1)[0].lower() == 'rem':
+                continue
+
+            if line[0].isspace() and option is not None:
+                option[1].append(line.strip())
+                option[3].append(line_number)
+                option[4].append(len(line) - len(line.lstrip()) + 1)
+                continue
+
+            if option is not None:
+                yield self._complete(option)
+                option = None
+
+            match = SECTION_XPR.match(line)
+            if match:
+                self._read_section(match.group('header'), line_number)
+                continue
+
+            if self.title is None:
+                self._fail(ParsingError(ONE_SECTION_REQUIRED,
+                                        line=line_number, column=1))
+                continue
+
+            match = OPTION_XPR.match(line)
+            if not match:
+                column = len(line) - len(line.lstrip()) + 1
+                self._fail(ParsingError(
+                        'Line has an invalid format (line %i, column %i):'
+                        ' "%s"' % (line_number, column, line.strip()),
+                        line=line_number, column=column))
+                continue
+
+            option = [match.group('option').rstrip(),
+                      [self._clean_value(match.group('value'))],
+                      line_number,
+                      [line_number],
+                      # An empty value starts after the separator.
+                      [min(match.start('value'),
+                           len(line.rstrip('\r\n'))) + 1]]
+
+        if option is not None:
+            yield self._complete(option)
+
+        if self.title is None:
+            self._fail(ParsingError(ONE_SECTION_REQUIRED))
+
+    def _complete(self, option):
+        self.value_line_numbers, self.value_line_columns = option[3:]
+        return tuple(option[:3])
+
+    def _read_section(self, title, line_number):
+        # Repeating the same section is allowed, as with the ConfigParser.
+        if self.title is not None and self.title != title:
+            self._fail(ParsingError(ONE_SECTION_REQUIRED, line=line_number,
+                                    column=1))
+            return
+
+        self.title = title
+        self.title_line_number = line_number
+
+    def _fail(self, error):
+        if self.errors is None:
+            raise error
+        self.errors.append(error)
+
+    def _clean_value(self, value):
+        # strip inline comments like the ConfigParser does
+        position = value.find(';')
+        if position > 0 and value[position - 1].isspace():
+            value = value[:position]
+
+        value = value.strip()
+        if value == '""':
+            return ''
+        return value
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from ftw.lawgiver.wdl.interfaces import ISpecification
 from ftw.lawgiver.wdl.interfaces import IStatus
 from ftw.lawgiver.wdl.interfaces import ITransition
@@ -16,6 +17,8 @@ class Specification(object):
         self.description = description
         self._initial_status_title = initial_status_title
         self.states = states or {}
+        self._transitions_by_title = None
+        self._transitions_by_src_status = None
         self.transitions = transitions or []
         self.role_mapping = role_mapping or {}
         self.generals = generals or []
@@ -25,9 +28,42 @@ class Specification(object):
     def __repr__(self):
         return '<Specification "%s">' % self.title
 
+    @property
+    def transitions(self):
+        return self._transitions
+
+    @transitions.setter
+    def transitions(self, transitions):
+        self._transitions = TransitionList(transitions,
+                                           self._reset_transition_index)
+        self._reset_transition_index()
+
     def get_initial_status(self):
         return self.states.get(self._initial_status_title)
 
+    def index_transitions(self):
+        self._transitions_by_title = {}
+        self._transitions_by_src_status = defaultdict(list)
+
+        for transition in self.transitions:
+            self._transitions_by_title.setdefault(transition.title, transition)
+            self._transitions_by_src_status[transition.src_status].append(
+                transition)
+
+    def get_transition_by_title(self, title):
+        if self._transitions_by_title is None:
+            self.index_transitions()
+        return self._transitions_by_title.get(title)
+
+    def get_transitions_by_src_status(self, status):
+        if self._transitions_by_src_status is None:
+            self.index_transitions()
+        return self._transitions_by_src_status.get(status, [])
+
+    def _reset_transition_index(self):
+        self._transitions_by_title = None
+        self._transitions_by_src_status = None
+
     def validate(self):
         if not self._initial_status_title:
             raise ValueError('No initial status defined.')
@@ -38,6 +74,33 @@ class Specification(object):
                     self._initial_status_title))
 
 
+class TransitionList(list):
+    """The transitions of a specification. Changing the list calls
+    `on_change`, so that the transition index is built again.
+    """
+
+    def __init__(self, transitions, on_change):
+        super(TransitionList, self).__init__(transitions)
+        self.on_change = on_change
+
+
+def _notifying(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        self.on_change()
+        return method(self, *args)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for name in ('append', 'extend', 'insert', 'remove', 'pop', 'reverse',
+             'sort', '__setitem__', '__delitem__', '__setslice__',
+             '__delslice__', '__iadd__', '__imul__'):
+    setattr(TransitionList, name, _notifying(name))
+
+
 class Status(object):
     implements(IStatus)
 
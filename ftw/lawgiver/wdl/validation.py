@@ -0,0 +1,222 @@
+from ftw.lawgiver.exceptions import ParsingError
+from ftw.lawgiver.generator import RoleInheritanceGraph
+from ftw.lawgiver.interfaces import IActionGroupRegistry
+from ftw.lawgiver.wdl.parser import PERMISSION_STATEMENT
+from ftw.lawgiver.wdl.parser import ROLE_INHERITANCE_STATEMENT
+from ftw.lawgiver.wdl.parser import SpecificationParser
+from ftw.lawgiver.wdl.parser import convert_statement
+from ftw.lawgiver.wdl.reader import SpecificationReader
+from zope.component import getUtility
+from zope.configuration import xmlconfig
+import argparse
+import importlib
+import os.path
+import sys
+
+
+def validate_specification(stream, action_groups=None):
+    """Parses the specification `stream` and collects all problems instead
+    of stopping at the first one.
+
+    Actions of statements are checked against the names in `action_groups`
+    when they are passed. Neither a Plone site nor the component registry
+    is needed.
+
+    Returns a list of ``(line_number, message)`` tuples sorted by line
+    number. The line number is `None` when the problem has no location.
+    """
+    parser = ValidatingSpecificationParser(action_groups)
+    parser(stream)
+    return sorted(set(parser.problems))
+
+
+class ValidatingSpecificationParser(SpecificationParser):
+    """A specification parser which collects the problems with their line
+    numbers in `problems` instead of raising the first one.
+    """
+
+    def __init__(self, action_groups=None):
+        super(ValidatingSpecificationParser, self).__init__()
+        self.action_groups = action_groups
+        self.problems = []
+        self._option_line_numbers = {}
+        self._statement_lines = []
+        self._transition_lines = {}
+
+    def _parse(self, stream):
+        errors = []
+        self._reader = SpecificationReader(stream, errors=errors)
+        self._convert(self._reader)
+
+        for error in errors:
+            self._report(error.line, str(error))
+
+        self._post_converting()
+        self._check_statements()
+        self._check_role_inheritance()
+        return self._spec
+
+    def _convert_option(self, name, value, line_number, specargs):
+        self._option_line_numbers[name.lower()] = line_number
+        super(ValidatingSpecificationParser, self)._convert_option(
+            name, value, line_number, specargs)
+
+    def _failed(self, error, line_number, column=None):
+        self._report(error.line or line_number, str(error))
+
+    def _convert_lines(self, value, converter):
+        results = []
+        for line, line_number, column in self._get_value_lines(value):
+            try:
+                result = converter(line)
+            except ParsingError, exc:
+                self._failed(exc, line_number, column)
+                continue
+
+            if converter == self._convert_transition_line:
+                self._transition_lines[result] = line_number
+            elif converter in (convert_statement,
+                               self._convert_general_statement):
+                self._statement_lines.append((line_number, result))
+
+            results.append(result)
+
+        return results
+
+    def _post_converting(self):
+        spec = self._spec
+
+        for transition in spec.transitions[:]:
+            try:
+                transition.augment_states(spec.states)
+            except ValueError, exc:
+                self._report(self._transition_lines.get(transition),
+                             str(exc))
+                spec.transitions.remove(transition)
+
+        spec.index_transitions()
+
+        try:
+            spec.validate()
+        except ValueError, exc:
+            self._report(self._option_line_numbers.get(
+                    'initial status', self._reader.title_line_number),
+                         str(exc))
+
+    def _check_statements(self):
+        spec = self._spec
+
+        for line_number, (type_, item) in self._statement_lines:
+            if type_ == PERMISSION_STATEMENT:
+                customer_roles = item[:1]
+                self._check_action(line_number, item[1])
+
+            elif type_ == ROLE_INHERITANCE_STATEMENT:
+                customer_roles = item
+                if len(item) != 2:
+                    self._report(line_number,
+                                 'Role inheritance statement has an invalid'
+                                 ' format.')
+
+            else:
+                customer_roles = [item]
+
+            for customer_role in customer_roles:
+                if customer_role not in spec.role_mapping:
+                    self._report(
+                        line_number,
+                        'The customer role "%s" is not mapped to a Plone'
+                        ' role in the role mapping.' % customer_role)
+
+    def _check_action(self, line_number, action):
+        if self.action_groups is None:
+            return
+
+        # Transitions with undefined states are reported separately.
+        if action in [transition.title
+                      for transition in self._transition_lines]:
+            return
+
+        if action not in self.action_groups:
+            self._report(
+                line_number,
+                'Action "%s" is neither action group nor transition.' % (
+                    action))
+
+    def _check_role_inheritance(self):
+        spec = self._spec
+
+        general_cycles = self._get_cyclic_roles(spec.role_inheritance)
+        if general_cycles:
+            self._report(self._option_line_numbers.get('general'),
+                         'Circular role inheritance: %s.' % (
+                    ', '.join(sorted(general_cycles))))
+
+        for status in spec.states.values():
+            cycles = self._get_cyclic_roles(
+                spec.role_inheritance + status.role_inheritance)
+            cycles -= general_cycles
+            if cycles:
+                self._report(self._option_line_numbers.get(
+                        ('status %s' % status.title).lower()),
+                             'Circular role inheritance: %s.' % (
+                        ', '.join(sorted(cycles))))
+
+    def _get_cyclic_roles(self, role_inheritance):
+        return set(RoleInheritanceGraph(
+                [pair for pair in role_inheritance
+                 if len(pair) == 2]).get_cyclic_roles())
+
+    def _report(self, line_number, message):
+        self.problems.append((line_number, message))
+
+
+def load_action_groups(packages=()):
+    """Loads the ``lawgiver.zcml`` of ftw.lawgiver and of the `packages`
+    (dotted names), which registers the action groups without starting
+    Zope.
+    """
+    for package in ('ftw.lawgiver', ) + tuple(packages):
+        xmlconfig.file('lawgiver.zcml', importlib.import_module(package))
+
+
+def main(argv=None):
+    """Validates specification files, e.g. in a pre-commit hook:
+    ``lawgiver-validate --zcml my.package path/to/specification.txt``.
+    Returns 1 when problems were found.
+    """
+    argparser = argparse.ArgumentParser(
+        description='Validate ftw.lawgiver workflow specifications.')
+    argparser.add_argument(
+        'paths', nargs='+', metavar='SPECIFICATION',
+        help='Path to a specification.txt.')
+    argparser.add_argument(
+        '--zcml', action='append', default=[], metavar='PACKAGE',
+        help='Package with a lawgiver.zcml registering action groups.')
+    argparser.add_argument(
+        '--action-group', action='append', default=[], dest='action_groups',
+        metavar='NAME', help='Name of an additional action group.')
+    arguments = argparser.parse_args(argv)
+
+    load_action_groups(arguments.zcml)
+    registry = getUtility(IActionGroupRegistry)
+
+    found_problems = False
+    for path in arguments.paths:
+        workflow_id = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        action_groups = set(
+            registry.get_action_groups_for_workflow(workflow_id))
+        action_groups.update(arguments.action_groups)
+
+        with open(path) as specfile:
+            problems = validate_specification(specfile, action_groups)
+
+        for line_number, message in problems:
+            found_problems = True
+            print '%s:%s: %s' % (path, line_number or 0, message)
+
+    return found_problems and 1 or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -65,11 +65,15 @@ setup(name='ftw.lawgiver',
         ],
 
       tests_require=tests_require,
-      extras_require=dict(tests=tests_require),
+      extras_require=dict(tests=tests_require,
+                          inotify=['pyinotify']),
 
       entry_points="""
       # -*- Entry points: -*-
       [z3c.autoinclude.plugin]
       target = plone
+
+      [console_scripts]
+      lawgiver-validate = ftw.lawgiver.wdl.validation:main
       """,
       )